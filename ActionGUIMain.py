@@ -2,7 +2,7 @@ from typing import List
 
 from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QMessageBox, QMainWindow, QTableWidgetItem, QHeaderView, QPushButton, QCheckBox, QWidget, \
-    QHBoxLayout
+    QHBoxLayout, QApplication
 from PyQt5.uic.properties import QtCore
 
 import GUIDetail
@@ -12,7 +12,7 @@ from src.Enums import SapoShop, Category, Channel, OrderStatus
 from src.Factory.OrderFactory import OrderAutoFactory, OrderAPIFactory, OrderFactory
 from src.Model.Order import Order
 from src.OrderRequest import OrderRequest
-from src.utils import set_default_if_none, get_current_date_time_to_midnight
+from src.utils import set_default_if_none, get_current_date_time_to_midnight, get_value_of_config_or_default
 
 
 class QStringLiteral:
@@ -24,7 +24,7 @@ class ActionMainGui(QMainWindow):
         super().__init__()
         self.main_gui = Ui_MainWindow()
         self.main_gui.setupUi(self)
-        self.list_items = ["Sapo - Shop thảo dược Giang", "Sapo - Quốc Cơ Quốc Nghiệp", "Web"]
+        self.list_items = ["Sapo - Shop thảo dược Giang", "Sapo - Quốc Cơ Quốc Nghiệp", "Web", "Tất cả các kênh"]
         self.list_orders_items = ["Đang giao hàng", "Đã hoàn thành"]
         self.add_default_value()
         self.add_action()
@@ -38,6 +38,8 @@ class ActionMainGui(QMainWindow):
         self.main_gui.btnSearch.clicked.connect(self.action_click_search)
         self.main_gui.cbSearchType.currentTextChanged.connect(self.changing_search_type)
         self.main_gui.btnSubmit.clicked.connect(self.action_click_submit)
+        self.main_gui.cbSelectAll.stateChanged.connect(
+            lambda state: self.change_state_all_orders_sent_to_misa(state))
 
     def add_default_value(self):
         self.main_gui.cbFilter.addItems(self.list_items)
@@ -82,6 +84,9 @@ class ActionMainGui(QMainWindow):
         else:
             if self.main_gui.cbFilter.currentIndex() == 2: # Submit at web
                 self.order_factory.submit_order(list(filter(lambda o: o.sent_to_misa == True, self.orders)), Channel.WEB)
+            elif self.main_gui.cbFilter.currentIndex() == 3: # Submit each order at its own channel
+                self.order_factory.submit_orders_by_channel(
+                    list(filter(lambda o: o.sent_to_misa == True, self.orders)), Channel.SAPO)
             else: # Submit at Sapo
                 self.order_factory.submit_order(list(filter(lambda o: o.sent_to_misa == True, self.orders)), Channel.SAPO)
             QMessageBox.information(self, 'Thông báo', 'Đã thêm hóa đơn vào Misa!', QMessageBox.Ok)
@@ -100,6 +105,7 @@ class ActionMainGui(QMainWindow):
             # Prepare the order request
             order_request = OrderRequest()
             order_request.status = OrderStatus.SHIPPING if self.main_gui.cbSelectOrder.currentIndex() == OrderStatus.SHIPPING.value else OrderStatus.COMPLETE
+            order_request.incremental = str(get_value_of_config_or_default('incremental_sync', False)).lower() == 'true'
 
             # Handle search type and prepare request
             if self.main_gui.cbSearchType.currentIndex() == 0 or self.main_gui.cbSearchType.currentIndex() == 2:
@@ -119,25 +125,43 @@ class ActionMainGui(QMainWindow):
             elif self.main_gui.cbFilter.currentIndex() == 2:  # Web
                 self.order_factory = OrderFactory.set_category_request(Category.API)
                 order_method = self.order_factory.create_web_order(order_request)
+            elif self.main_gui.cbFilter.currentIndex() == 3:  # Every Sapo shop and the web at once
+                self.order_factory = OrderFactory.set_category_request(Category.AUTO)
+                order_method = self.order_factory.create_all_channel_order(order_request)
             else:
                 QMessageBox.critical(self, 'Lỗi', 'Vui lòng chọn kênh', QMessageBox.Ok)
                 return
 
             # Handle search type and prepare request
             if self.main_gui.cbSearchType.currentIndex() == 0:
-                orders = order_method.get_orders_by_date()
+                orders = order_method.iter_orders_by_date()
             elif self.main_gui.cbSearchType.currentIndex() == 1:
-                orders = order_method.get_orders_by_search()
+                orders = order_method.iter_orders_by_search()
             else:
-                orders = order_method.get_orders_by_search_and_date()
-
-            self.main_gui.cbSelectAll.stateChanged.connect(
-                lambda state: self.change_state_all_orders_sent_to_misa(state))
-            self.main_gui.tableWidget.setRowCount(len(orders))
-            self.orders = orders
-            self.create_detail_table()
+                orders = order_method.iter_orders_by_search_and_date()
+
+            # Show orders while the next pages are still downloading, another search or a submit must
+            # wait until the list is complete
+            self.set_search_controls_enabled(False)
+            try:
+                self.orders = []
+                self.main_gui.tableWidget.setRowCount(0)
+                for order in orders:
+                    self.orders.append(order)
+                    self.main_gui.tableWidget.setRowCount(len(self.orders))
+                    self.create_detail_row(len(self.orders) - 1, order)
+                    QApplication.processEvents()
+            finally:
+                orders.close()
+                self.set_search_controls_enabled(True)
+            self.set_check_all_state()
             QMessageBox.information(self, 'Thông báo', 'Đã lấy hóa đơn từ Sapo theo bộ lọc', QMessageBox.Ok)
 
+    def set_search_controls_enabled(self, enabled: bool):
+        for control in (self.main_gui.btnSearch, self.main_gui.btnSubmit, self.main_gui.cbFilter,
+                        self.main_gui.cbSearchType, self.main_gui.cbSelectOrder, self.main_gui.cbSelectAll):
+            control.setEnabled(enabled)
+
     def go_to_detail_page(self, order: Order):
         self.detail.get_order_detail(order)
         self.detail.show()
@@ -169,41 +193,42 @@ class ActionMainGui(QMainWindow):
         self.create_detail_table()
 
     def create_detail_table(self):
-        current_row = 0
-        for order in self.orders:
-            # Checkbox
-            checkbox = QCheckBox(self.main_gui.tableWidget)
-            checkbox.setObjectName(f"cbx_{str(order.code)}")
-            checkbox.setChecked(order.sent_to_misa)
-            if checkbox.isChecked():
-                order.sent_to_misa = True
-            else:
-                order.sent_to_misa = False
-
-            checkbox.stateChanged.connect(lambda state, order=order: self.change_state_sent_to_misa(state, order))
-            self.checkboxes.append(checkbox)
-            cell_widget = QWidget()
-            lay_out = QHBoxLayout(cell_widget)
-            lay_out.addWidget(checkbox)
-            lay_out.setAlignment(Qt.AlignCenter)
-            lay_out.setContentsMargins(0, 0, 0, 0)
-            cell_widget.setLayout(lay_out)
-
-            self.main_gui.tableWidget.setCellWidget(current_row, 0, cell_widget)
-            self.main_gui.tableWidget.setItem(current_row, 1, QTableWidgetItem(order.code))
-            self.main_gui.tableWidget.setItem(current_row, 2,
-                                              QTableWidgetItem(f"{set_default_if_none(order.customer_data.name)}"
-                                                               f" - {set_default_if_none(order.customer_data.phone_number)}"))
-            self.main_gui.tableWidget.setItem(current_row, 3, QTableWidgetItem(order.created_on))
-            self.main_gui.tableWidget.setItem(current_row, 4, QTableWidgetItem(str(order.total)))
-            self.main_gui.tableWidget.setItem(current_row, 5, QTableWidgetItem(str(order.source_name)))
-            btn = QPushButton(self.main_gui.tableWidget)
-            btn.setText('Xem')
-            btn.setObjectName(str(order.code))
-
-            self.main_gui.tableWidget.setCellWidget(current_row, 6, btn)
-
-            btn.clicked.connect(lambda checked, order=order: self.go_to_detail_page(order))
-            current_row = current_row + 1
+        for current_row, order in enumerate(self.orders):
+            self.create_detail_row(current_row, order)
 
         self.set_check_all_state()
+
+    def create_detail_row(self, current_row, order: Order):
+        # Checkbox
+        checkbox = QCheckBox(self.main_gui.tableWidget)
+        checkbox.setObjectName(f"cbx_{str(order.code)}")
+        checkbox.setChecked(order.sent_to_misa)
+        if checkbox.isChecked():
+            order.sent_to_misa = True
+        else:
+            order.sent_to_misa = False
+
+        checkbox.stateChanged.connect(lambda state, order=order: self.change_state_sent_to_misa(state, order))
+        self.checkboxes.append(checkbox)
+        cell_widget = QWidget()
+        lay_out = QHBoxLayout(cell_widget)
+        lay_out.addWidget(checkbox)
+        lay_out.setAlignment(Qt.AlignCenter)
+        lay_out.setContentsMargins(0, 0, 0, 0)
+        cell_widget.setLayout(lay_out)
+
+        self.main_gui.tableWidget.setCellWidget(current_row, 0, cell_widget)
+        self.main_gui.tableWidget.setItem(current_row, 1, QTableWidgetItem(order.code))
+        self.main_gui.tableWidget.setItem(current_row, 2,
+                                          QTableWidgetItem(f"{set_default_if_none(order.customer_data.name)}"
+                                                           f" - {set_default_if_none(order.customer_data.phone_number)}"))
+        self.main_gui.tableWidget.setItem(current_row, 3, QTableWidgetItem(order.created_on))
+        self.main_gui.tableWidget.setItem(current_row, 4, QTableWidgetItem(str(order.total)))
+        self.main_gui.tableWidget.setItem(current_row, 5, QTableWidgetItem(str(order.source_name)))
+        btn = QPushButton(self.main_gui.tableWidget)
+        btn.setText('Xem')
+        btn.setObjectName(str(order.code))
+
+        self.main_gui.tableWidget.setCellWidget(current_row, 6, btn)
+
+        btn.clicked.connect(lambda checked, order=order: self.go_to_detail_page(order))
@@ -1,57 +1,107 @@
-import json
 import math
-import re
-from typing import List
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import List, Iterator, Optional
+from urllib.parse import quote
 
-import requests
-
-from src.Enums import SearchType
-from src.Exceptions import ItemError
+from src.Enums import SearchType, Channel
+from src.HttpTransport import get_transport
 from src.IRetreiveOrder import Web
-from src.InputProduct import InputDetailProduct
 from src.Model.Item import CompositeItem
 from src.Model.Order import Order
 from src.OrderRequest import OrderRequest
-from src.utils import set_up_logger, get_item_information, get_value_of_config, parse_time_format_of_web
+from src.OrderSyncState import OrderSyncState
+from src.Paginator import iter_pages_concurrently
+from src.Singleton.CatalogService import CatalogService
+from src.Singleton.OrderStore import OrderStore
+from src.WebPricingEngine import WebPricingEngine
+from src.utils import set_up_logger, get_value_of_config, get_value_of_config_or_default, parse_time_format_of_web, \
+    parse_time_format_webAPI
 
 
 class APIWebOrder(Web):
     def __init__(self, order: OrderRequest):
         self.logging = set_up_logger("Middleware_Tool")
-        self.orders = []
         self.from_date = parse_time_format_of_web(order.from_date)
         self.to_date = parse_time_format_of_web(order.to_date)
+        # Web orders are filtered by day, the sync state compares ISO days
+        self.from_day = order.from_date[:10] if order.from_date else None
+        self.to_day = order.to_date[:10] if order.to_date else None
+        self.incremental = order.incremental
         self.to_search_order = order.orders
         self.payment_methods = []
-        self.item_information = get_item_information()
-        self.products = self.__get_product_information__()
-        self.cookies = self.authentication()
-        self.meta_page = {}
+        self.catalog = CatalogService().catalog
+        self.pricing = WebPricingEngine(self.catalog)
+        self.order_store = OrderStore()
+        self.channel = "web"
+        self.transport = self.create_transport()
+        self.page_size = int(get_value_of_config_or_default('web_api_page_size', 100))
         self.request_type = SearchType.SearchOrder
 
+    def create_transport(self):
+        # Code chunks are searched in parallel and each of them fetches its pages concurrently
+        pool_size = (int(get_value_of_config_or_default('web_search_workers', 4))
+                     * int(get_value_of_config_or_default('web_fetch_workers', 4)))
+        return get_transport(get_value_of_config('api_url'), self.authentication, pool_size)
+
     def get_orders_by_search(self) -> List[Order]:
-        self.request_type = SearchType.SearchOrder
-        try:
-            self.filter_orders_date_time()
-            return self.orders
-        except Exception as e:
-            self.logging.error(msg=f"[Search] API Web Order got error by search: {e}")
+        return list(self.iter_orders_by_search())
 
     def get_orders_by_date(self) -> List[Order]:
-        self.request_type = SearchType.DateOrder
-        try:
-            self.filter_orders_date_time()
-            return self.orders
-        except Exception as e:
-            self.logging.error(msg=f"[Date] API Web Order got error by search: {e}")
+        return list(self.iter_orders_by_date())
 
     def get_orders_by_search_and_date(self) -> List[Order]:
+        return list(self.iter_orders_by_search_and_date())
+
+    def iter_orders_by_search(self) -> Iterator[Order]:
+        self.request_type = SearchType.SearchOrder
+        # Orders downloaded recently come from the order store, only the others are searched on the web
+        max_age = float(get_value_of_config_or_default('order_store_ttl_hours', 24)) * 3600
+        codes = []
+        for code in dict.fromkeys(self.to_search_order):
+            order_json = self.order_store.find_by_code(self.channel, code, max_age)
+            if order_json is None:
+                codes.append(code)
+            else:
+                yield from self.load_orders([order_json])
+        if codes:
+            self.to_search_order = codes
+            yield from self._iter_priced_orders(self.filter_orders_date_time(), "[Search]")
+
+    def iter_orders_by_date(self) -> Iterator[Order]:
+        self.request_type = SearchType.DateOrder
+        yield from self._iter_priced_orders(self.iter_synced_orders(), "[Date]")
+
+    def iter_orders_by_search_and_date(self) -> Iterator[Order]:
         self.request_type = SearchType.SearchDateOrder
+        yield from self._iter_priced_orders(self.filter_orders_date_time(), "[Search and Date]")
+
+    def _iter_priced_orders(self, pages, log_prefix):
         try:
-            self.filter_orders_date_time()
-            return self.orders
+            for orders_json in pages:
+                yield from self.load_orders(orders_json)
         except Exception as e:
-            self.logging.error(msg=f"[Search and Date] API Web Order got error by search: {e}")
+            self.logging.error(msg=f"{log_prefix} API Web Order got error by search: {e}")
+
+    def load_orders(self, orders_json: List[dict]) -> List[Order]:
+        # Orders already priced against the current catalog come back from the order store as they are
+        orders, downloaded = [], []
+        for order_json in orders_json:
+            enriched_json = self.order_store.get_enriched(self.channel, order_json, self.catalog.source_hash)
+            if enriched_json is not None:
+                order = Order.from_json(enriched_json)
+            else:
+                order = Order.from_dict(order_json)
+                downloaded.append((order_json, order))
+            order.origin = self.channel
+            order.origin_channel = Channel.WEB
+            orders.append(order)
+
+        failed = self.pricing.price_orders([order for _, order in downloaded])
+        self.order_store.save(self.channel,
+                              [(order_json, order.to_json() if index not in failed else None, self.catalog.source_hash)
+                               for index, (order_json, order) in enumerate(downloaded)])
+        return orders
 
     def authentication(self):
         url = f"{get_value_of_config('api_url')}/login/"
@@ -59,101 +109,127 @@ class APIWebOrder(Web):
         headers = {
             'Content-Type': 'application/x-www-form-urlencoded'
         }
-        response = requests.post(url=url, headers=headers, data=payload)
+        response = self.transport.post(url=url, headers=headers, data=payload, authenticate=False)
         return response.cookies.get_dict()
 
     def filter_orders_date_time(self):
-        self._process_orders_from_page(1)
-        for page in range(2, self.meta_page["total_page"] + 1):
-            self._process_orders_from_page(page)
-
-    def _process_orders_from_page(self, page):
-        list_orders = self._get_list_order_from_page(page)
-        for order in list_orders:
-            self.__update_order_information__(order)
-        self.orders.extend(list_orders)
-        self.to_search_order.extend(order.code for order in list_orders)
-
-    def _get_list_order_from_page(self,page):
+        # The search parameters are frozen once per request, every page is fetched with the same query
         params = self.prepare_params_list_orders()
-        order_request = requests.get(f"{get_value_of_config('api_url')}/api/v1/orders/all?"
-                                     f"time__icontains={params.get('time_request', '')}"
-                                     f"&uid__icontains={params.get('order_request', '')}"
-                                     f"&page={page}",
-                                     cookies=self.cookies)
-        parse_json = json.loads(order_request.text)["orders"]
-
-        if self.meta_page.get('total', None) is None:
-            self.meta_page["total"] = json.loads(order_request.text)['total']
-            self.meta_page["current_page"] = json.loads(order_request.text)['page']
-            self.meta_page["total_page"] = math.ceil(self.meta_page.get("total") / 10)
+        time_request = params.get('time_request', '')
+        order_requests = params.get('order_requests') or ['']
+        if len(order_requests) == 1:
+            yield from self.iter_order_json_pages(time_request, order_requests[0])
+            return
+
+        # Long code lists are split into chunks queried in parallel, an order matched by several
+        # chunks is only yielded once
+        seen_ids = set()
+        workers = int(get_value_of_config_or_default('web_search_workers', 4))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self._get_all_orders, time_request, order_request)
+                       for order_request in order_requests]
+            for future in as_completed(futures):
+                list_orders = [order for order in future.result() if order['id'] not in seen_ids]
+                seen_ids.update(order['id'] for order in list_orders)
+                if list_orders:
+                    yield list_orders
+
+    def _get_all_orders(self, time_request, order_request):
+        return [order for list_orders in self.iter_order_json_pages(time_request, order_request)
+                for order in list_orders]
+
+    def iter_order_json_pages(self, time_request, order_request):
+        first_page = self.get_order_page(1, time_request, order_request)
+        # The API may cap page_size, the real size is the one of the first page
+        page_size = max(len(first_page['orders']), 1)
+        total_page = math.ceil(first_page['total'] / page_size)
+        workers = int(get_value_of_config_or_default('web_fetch_workers', 4))
+        yield from iter_pages_concurrently(
+            lambda page: self.get_order_page(page, time_request, order_request)['orders'],
+            first_page['orders'], total_page, workers)
+
+    def get_order_page(self, page, time_request, order_request):
+        response = self.transport.get(f"{get_value_of_config('api_url')}/api/v1/orders/all",
+                                      params={'time__icontains': time_request,
+                                              'uid__icontains': order_request,
+                                              'page': page,
+                                              'page_size': self.page_size})
+        response.raise_for_status()
+        return response.json()
+
+    def iter_synced_orders(self) -> Iterator[List[dict]]:
+        # Every date search goes through the sync state of the web channel in the order store
+        sync_state = self.get_sync_state()
+        time_request = self.get_sync_time_request(sync_state)
+        if time_request is not None:
+            for orders_json in self.iter_order_json_pages(time_request, ''):
+                self.merge_synced_orders(sync_state, orders_json)
+                if sync_state.is_reset:
+                    # The whole window is downloaded again, its pages are the result
+                    yield orders_json
+            is_reset = sync_state.is_reset
+            self.save_sync_state(sync_state, time_request)
+            if is_reset:
+                return
+        yield from self.iter_stored_pages(sync_state)
+
+    def get_sync_state(self) -> OrderSyncState:
+        return OrderSyncState("web", self.channel, self._get_created_day)
+
+    def get_sync_time_request(self, sync_state: OrderSyncState) -> Optional[str]:
+        # None when the window is re-opened from the order store, otherwise the days to download
+        max_age = float(get_value_of_config_or_default('order_store_ttl_hours', 24)) * 3600
+        if sync_state.is_fresh(self.from_day, self.to_day, '', max_age):
+            self.logging.info(msg=f"[Sync] Web: {self.from_day} / {self.to_day} re-opened from the order store")
+            return None
+        if self.incremental and sync_state.can_resume(self.from_day, ''):
+            # Only the days from the last order seen onwards are downloaded again
+            since = datetime.strptime(sync_state.watermark, '%Y-%m-%d').strftime('%m/%d/%Y')
+            return f"{since} / {self.to_date}"
+        sync_state.reset(self.from_day, self.to_day, '')
+        return f"{self.from_date} / {self.to_date}"
+
+    def merge_synced_orders(self, sync_state: OrderSyncState, orders_json: List[dict]):
+        for order_json in orders_json:
+            sync_state.merge(order_json, True, self._get_created_day(order_json))
+
+    def save_sync_state(self, sync_state: OrderSyncState, time_request: str):
+        sync_state.extend_to(self.to_day)
+        sync_state.save(synced_until=datetime.now().strftime('%Y-%m-%d'))
+        self.logging.info(msg=f"[Sync] Web: {sync_state.changed_count} orders downloaded for {time_request}")
+
+    def iter_stored_pages(self, sync_state: OrderSyncState) -> Iterator[List[dict]]:
+        orders_json = sync_state.get_orders_between(self.from_day, self.to_day)
+        for start in range(0, len(orders_json), self.page_size):
+            yield orders_json[start:start + self.page_size]
 
-        return [Order.from_dict(order) for order in parse_json]
+    @staticmethod
+    def _get_created_day(order_json):
+        return parse_time_format_webAPI(order_json['created_on']).strftime('%Y-%m-%d')
 
     def prepare_params_list_orders(self):
-        orders = ""
+        orders = []
         time = ""
         if self.request_type == SearchType.SearchOrder or self.request_type == SearchType.SearchDateOrder:
-            orders = ':'.join(self.to_search_order)
+            orders = self.split_search_orders(list(dict.fromkeys(self.to_search_order)))
 
         if self.request_type == SearchType.DateOrder or self.request_type == SearchType.SearchDateOrder:
             time = f"{self.from_date} / {self.to_date}"
 
-        return {"order_request": orders, "time_request": time}
+        return {"order_requests": orders, "time_request": time}
 
     @staticmethod
-    def __remove_letters_and_spaces__(input_string):
-        # Sử dụng biểu thức chính quy để loại bỏ các ký tự chữ cái và khoảng trắng
-        result = re.sub(r'[a-zA-Zđ\s,]', '',  input_string)
-        return result
-
-    def __update_order_information__(self, order: Order):
-        try:
-            for order_line in order.order_line_items:
-                tax_amount = 0
-                order_line.price = self.__remove_letters_and_spaces__(order_line.price)
-                order_line.discount_amount = 0
-                order_line.distributed_discount_amount = 0
-
-                # Check SKU of line_item not equal at first one of composite
-                order_line.is_composite = True
-
-                # Update base price from excel file
-                for composite_item in order_line.composite_item_domains:
-                    composite_item.quantity = int(order_line.quantity) if order_line.sku == composite_item.sku else int(composite_item.original_quantity) * int(order_line.quantity)
-                    composite_item.unit = self.__get_product_details__(composite_item.sku).Unit
-                    composite_item.discount = self.__calculate_discount_rate__(base_price=self.__get_base_price_by_sku(composite_item.sku),
-                                                                               sale_price=composite_item.price)
-                    composite_item.price = self.__get_base_price_by_sku(composite_item.sku)
-                    composite_item.sku = self.__get_product_details__(composite_item.sku).Product_Title
-
-                    # Formula calculate VAT After Applying Discount into Product
-                    # VATTax =  (BasePrice - (BasePrice * Discount /100))  * Quantity * 10%
-                    tax_amount += (composite_item.price - (composite_item.price * float(composite_item.discount) / 100)) * composite_item.quantity * 0.1
-
-                order_line.tax_amount = tax_amount
-                base_item_price = sum(float(composite_item.price)*composite_item.quantity for composite_item in order_line.composite_item_domains)
-                order_line.discount_rate = self.__calculate_discount_rate__(base_price=base_item_price, sale_price=order_line.price)
-        except Exception as e:
-            self.logging.error(msg=f"Cannot update order information of order {order.code} with detail {order} at error {e}")
-
-    def __get_product_information__(self):
-        product_detail = sum([prod.Product for prod in self.item_information], [])
-        return product_detail
-
-    def __get_product_details__(self, sku) -> InputDetailProduct:
-        try:
-            return [item for item in self.products if item.Product_Id == sku][0]
-        except Exception:
-            raise ItemError(message=f"Cannot found sku {sku} from resource. Please check again.")
-
-    def __get_base_price_by_sku(self, sku) -> float:
-        return float(self.__get_product_details__(sku).Price_not_VAT)
-
-    @staticmethod
-    def __calculate_discount_rate__(base_price, sale_price):
-        sale_price_before_vat = float(sale_price) / 1.1
-        return str(round((base_price - sale_price_before_vat)/base_price * 100, 2))
-
-
-
+    def split_search_orders(codes: List[str]) -> List[str]:
+        # uid__icontains values joined with ':' and kept under web_search_max_length once URL-encoded
+        max_length = int(get_value_of_config_or_default('web_search_max_length', 1500))
+        chunks, current, length = [], [], 0
+        for code in codes:
+            code_length = len(quote(code)) + 3  # ':' is encoded as %3A
+            if current and length + code_length > max_length:
+                chunks.append(':'.join(current))
+                current, length = [], 0
+            current.append(code)
+            length += code_length
+        if current:
+            chunks.append(':'.join(current))
+        return chunks
@@ -0,0 +1,226 @@
+import asyncio
+import math
+from contextlib import asynccontextmanager
+from typing import List, Iterator, AsyncIterator
+
+import aiohttp
+
+from src.APIWebOrder import APIWebOrder
+from src.Enums import SearchType
+from src.Model.Order import Order
+from src.OrderRequest import OrderRequest
+from src.utils import get_value_of_config, get_value_of_config_or_default
+
+
+class AsyncAPIWebOrder(APIWebOrder):
+    """
+    asyncio client of the web order API.
+
+    Every page and code chunk of a search is requested at once on a single pooled aiohttp session,
+    at most ``web_async_concurrency`` at a time. The login happens on the first request and its cookies
+    are reused by the following requests and searches until the API answers 401. The ``*_async``
+    coroutines are the implementation, the ``get_orders_by_*`` methods run them for synchronous callers
+    and the ``iter_orders_by_*`` generators yield the orders of every page as it arrives. Every method of
+    ``APIWebOrder`` that sends a request is overridden to go through aiohttp, so no requests transport
+    is built.
+    """
+
+    def __init__(self, order: OrderRequest):
+        super().__init__(order)
+        self.concurrency = int(get_value_of_config_or_default('web_async_concurrency', 8))
+        self._session = None
+        self._semaphore = None
+        self._auth_lock = None
+        self._cookies = {}
+        self._cookies_generation = 0
+
+    def get_orders_by_search(self) -> List[Order]:
+        return asyncio.run(self.get_orders_by_search_async())
+
+    def get_orders_by_date(self) -> List[Order]:
+        return asyncio.run(self.get_orders_by_date_async())
+
+    def get_orders_by_search_and_date(self) -> List[Order]:
+        return asyncio.run(self.get_orders_by_search_and_date_async())
+
+    def create_transport(self):
+        # Every request goes through the aiohttp session
+        return None
+
+    def authentication(self) -> dict:
+        async def login():
+            async with self._open_session():
+                await self._authenticate(seen_generation=self._cookies_generation)
+            return self._cookies
+
+        return asyncio.run(login())
+
+    def get_order_page(self, page, time_request, order_request) -> dict:
+        async def get_page():
+            async with self._open_session():
+                return await self._get_order_page_async(page, time_request, order_request)
+
+        return asyncio.run(get_page())
+
+    def filter_orders_date_time(self) -> Iterator[List[dict]]:
+        params = self.prepare_params_list_orders()
+        yield from self._iter_pages(params.get('time_request', ''), params.get('order_requests') or [''])
+
+    def iter_order_json_pages(self, time_request, order_request) -> Iterator[List[dict]]:
+        # Date searches of APIWebOrder.iter_synced_orders get their pages as they arrive too
+        yield from self._iter_pages(time_request, [order_request])
+
+    def _get_all_orders(self, time_request, order_request) -> List[dict]:
+        return [order for list_orders in self._iter_pages(time_request, [order_request]) for order in list_orders]
+
+    def _iter_pages(self, time_request, order_requests) -> Iterator[List[dict]]:
+        # The event loop only runs while the next page is awaited, the requests in flight go on meanwhile
+        pages = self._iter_order_pages_async(time_request, order_requests)
+        loop = asyncio.new_event_loop()
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(pages.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            loop.run_until_complete(pages.aclose())
+            loop.close()
+
+    async def get_orders_by_search_async(self) -> List[Order]:
+        self.request_type = SearchType.SearchOrder
+        # Orders downloaded recently come from the order store, only the others are searched on the web
+        max_age = float(get_value_of_config_or_default('order_store_ttl_hours', 24)) * 3600
+        orders, codes = [], []
+        for code in dict.fromkeys(self.to_search_order):
+            order_json = self.order_store.find_by_code(self.channel, code, max_age)
+            if order_json is None:
+                codes.append(code)
+            else:
+                orders.extend(self.load_orders([order_json]))
+        if codes:
+            self.to_search_order = codes
+            orders.extend(await self._get_priced_orders("[Search]"))
+        return orders
+
+    async def get_orders_by_date_async(self) -> List[Order]:
+        # Date searches go through the sync state of the order store, as on the synchronous client
+        self.request_type = SearchType.DateOrder
+        sync_state = self.get_sync_state()
+        time_request = self.get_sync_time_request(sync_state)
+        if time_request is not None:
+            try:
+                async with self._open_session():
+                    orders_json = await self._get_all_orders_async(time_request, '')
+            except Exception as e:
+                self.logging.error(msg=f"[Date] Async API Web Order got error: {e}")
+                return []
+            self.merge_synced_orders(sync_state, orders_json)
+            self.save_sync_state(sync_state, time_request)
+        return self.load_orders(sync_state.get_orders_between(self.from_day, self.to_day))
+
+    async def get_orders_by_search_and_date_async(self) -> List[Order]:
+        self.request_type = SearchType.SearchDateOrder
+        return await self._get_priced_orders("[Search and Date]")
+
+    async def _get_priced_orders(self, log_prefix) -> List[Order]:
+        orders_json = []
+        try:
+            params = self.prepare_params_list_orders()
+            async for list_orders in self._iter_order_pages_async(params.get('time_request', ''),
+                                                                  params.get('order_requests') or ['']):
+                orders_json.extend(list_orders)
+        except Exception as e:
+            self.logging.error(msg=f"{log_prefix} Async API Web Order got error: {e}")
+            return []
+        return self.load_orders(orders_json)
+
+    async def _iter_order_pages_async(self, time_request, order_requests) -> AsyncIterator[List[dict]]:
+        # Pages in the order they arrive, an order matched by several code chunks is only yielded once
+        seen_ids = set()
+        async with self._open_session():
+            tasks = {asyncio.ensure_future(self._get_order_page_async(1, time_request, order_request)):
+                     (1, order_request) for order_request in order_requests}
+            try:
+                while tasks:
+                    done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        page, order_request = tasks.pop(task)
+                        result = task.result()
+                        if page == 1:
+                            # The API may cap page_size, the real size is the one of the first page
+                            page_size = max(len(result['orders']), 1)
+                            for next_page in range(2, math.ceil(result['total'] / page_size) + 1):
+                                tasks[asyncio.ensure_future(
+                                    self._get_order_page_async(next_page, time_request, order_request))] = \
+                                    (next_page, order_request)
+                        list_orders = [order for order in result['orders'] if order['id'] not in seen_ids]
+                        seen_ids.update(order['id'] for order in list_orders)
+                        if list_orders:
+                            yield list_orders
+            finally:
+                # The caller stopped or a page failed: the other requests end before the session closes
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _get_all_orders_async(self, time_request, order_request) -> List[dict]:
+        first_page = await self._get_order_page_async(1, time_request, order_request)
+        # The API may cap page_size, the real size is the one of the first page
+        page_size = max(len(first_page['orders']), 1)
+        total_page = math.ceil(first_page['total'] / page_size)
+        pages = await asyncio.gather(*(self._get_order_page_async(page, time_request, order_request)
+                                       for page in range(2, total_page + 1)))
+        return first_page['orders'] + [order for page in pages for order in page['orders']]
+
+    async def _get_order_page_async(self, page, time_request, order_request) -> dict:
+        url = f"{get_value_of_config('api_url')}/api/v1/orders/all"
+        params = {'time__icontains': time_request,
+                  'uid__icontains': order_request,
+                  'page': page,
+                  'page_size': self.page_size}
+        async with self._semaphore:
+            await self._authenticate()
+            generation = self._cookies_generation
+            async with self._session.get(url, params=params) as response:
+                if response.status != 401:
+                    response.raise_for_status()
+                    return await response.json(content_type=None)
+
+            # Session expired: log in again once, then retry
+            await self._authenticate(seen_generation=generation)
+            async with self._session.get(url, params=params) as response:
+                response.raise_for_status()
+                return await response.json(content_type=None)
+
+    async def _authenticate(self, seen_generation=None):
+        async with self._auth_lock:
+            # Concurrent requests wait for the same login, concurrent 401s only trigger one new login
+            if self._cookies_generation and (seen_generation is None or seen_generation != self._cookies_generation):
+                return
+            data = {'email': get_value_of_config('website_login'),
+                    'password': get_value_of_config('website_password')}
+            async with self._session.post(f"{get_value_of_config('api_url')}/login/", data=data) as response:
+                response.raise_for_status()
+                self._cookies = {name: morsel.value for name, morsel in response.cookies.items()}
+            self._session.cookie_jar.update_cookies(self._cookies)
+            self._cookies_generation += 1
+
+    @asynccontextmanager
+    async def _open_session(self):
+        if self._session is not None:
+            yield self._session
+            return
+
+        # The session, the semaphore and the lock belong to the running event loop
+        self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.concurrency),
+                                              cookie_jar=aiohttp.CookieJar(unsafe=True),
+                                              timeout=aiohttp.ClientTimeout(total=60))
+        self._session.cookie_jar.update_cookies(self._cookies)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._auth_lock = asyncio.Lock()
+        try:
+            yield self._session
+        finally:
+            await self._session.close()
+            self._session = None
@@ -0,0 +1,74 @@
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from requests.cookies import RequestsCookieJar
+
+from src.Exceptions import ValidationError
+from src.HttpTransport import HttpTransport
+from src.Interface.ISapoAuthentication import ISapoAuthentication
+from src.utils import get_value_of_config
+
+
+class _LoginFormParser(HTMLParser):
+    """
+    Collects the action and the input fields of the Sapo login form (the form holding a password input).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.forms = []
+        self._current = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'form':
+            self._current = {'id': attrs.get('id'), 'action': attrs.get('action'), 'fields': {}, 'types': set()}
+            self.forms.append(self._current)
+        elif tag == 'input' and self._current is not None and attrs.get('name'):
+            self._current['fields'][attrs['name']] = attrs.get('value') or ''
+            self._current['types'].add((attrs.get('type') or 'text').lower())
+
+    def handle_endtag(self, tag):
+        if tag == 'form':
+            self._current = None
+
+    def get_login_form(self):
+        for form in self.forms:
+            if form['id'] == 'pos-login-form':
+                return form
+        return next((form for form in self.forms if 'password' in form['types']), None)
+
+
+class FormSapoAuthentication(ISapoAuthentication):
+    """
+    Replays the Sapo login form over plain HTTP, then opens the shop admin so the single sign-on
+    redirects drop the shop cookies into the session. No browser is involved. The cookies are returned
+    as a cookie jar, so the single sign-on and the shop cookies keep their own domain.
+    """
+
+    def __init__(self, domain: str, transport: HttpTransport):
+        self.domain = domain
+        self.transport = transport
+
+    def login(self) -> RequestsCookieJar:
+        login_url = get_value_of_config("sapo_url")
+        login_page = self.transport.get(login_url, authenticate=False)
+        login_page.raise_for_status()
+
+        parser = _LoginFormParser()
+        parser.feed(login_page.text)
+        form = parser.get_login_form()
+        if form is None:
+            raise ValidationError(message=f"Cannot find the login form at {login_url}")
+
+        # Hidden fields (CSRF token...) are sent back as they are
+        payload = dict(form['fields'])
+        payload['username'] = get_value_of_config("sapo_phone")
+        payload['password'] = get_value_of_config("sapo_password")
+        response = self.transport.post(urljoin(login_page.url, form['action'] or ''), data=payload,
+                                       authenticate=False)
+        response.raise_for_status()
+
+        shop = self.transport.get(f"{self.domain}/admin", authenticate=False)
+        shop.raise_for_status()
+        return self.transport.session.cookies.copy()
@@ -0,0 +1,30 @@
+from src.Exceptions import ValidationError
+from src.HttpTransport import HttpTransport
+from src.Interface.ISapoAuthentication import ISapoAuthentication
+from src.utils import get_value_of_config
+
+
+class PrivateAppSapoAuthentication(ISapoAuthentication):
+    """
+    Uses the API key and secret of a Sapo private app with HTTP basic auth.
+
+    conf.yml:
+        sapo_private_apps:
+          <shop domain>:
+            api_key: ...
+            api_secret: ...
+    """
+    is_persistent = False
+
+    def __init__(self, domain: str, transport: HttpTransport):
+        self.domain = domain
+        self.transport = transport
+
+    def login(self) -> dict:
+        host = self.domain.split('://', 1)[-1]
+        try:
+            credentials = get_value_of_config('sapo_private_apps')[host]
+            self.transport.session.auth = (credentials['api_key'], credentials['api_secret'])
+        except (KeyError, TypeError):
+            raise ValidationError(message=f"Config is missing sapo_private_apps credentials of {host}")
+        return {}
@@ -0,0 +1,86 @@
+import threading
+
+from selenium.webdriver.common.by import By
+
+from src.Interface.ISapoAuthentication import ISapoAuthentication
+from src.Singleton.AppConfig import AppConfig
+from src.utils import get_value_of_config, check_element_can_clickable
+
+
+class SeleniumSapoAuthentication(ISapoAuthentication):
+    """
+    Logs in through the Sapo web UI with Chrome and hands the cookies of the shop window over.
+    """
+    # AppConfig holds a single Chrome, shops fetched in parallel take turns to log in
+    _login_lock = threading.Lock()
+
+    def __init__(self, domain: str):
+        self.domain = domain
+
+    @property
+    def driver(self):
+        return AppConfig().chrome_driver
+
+    def login(self) -> dict:
+        with self._login_lock:
+            try:
+                self.open_website()
+                self.authentication()
+                self.click_domain_shop()
+                self.driver.maximize_window()
+                self.handle_windows()
+                self.go_to_order_page()
+                return self.get_website_cookie()
+            finally:
+                # The browser is only needed to log in, every later call goes through HTTP
+                AppConfig.destroy_instance()
+
+    def open_website(self):
+        url = get_value_of_config("sapo_url")
+        self.driver.get(url)
+
+    def authentication(self):
+        self.input_login_phone()
+        self.input_login_password()
+        self.click_login_button()
+
+    def input_login_phone(self):
+        phone = get_value_of_config("sapo_phone")
+        self.driver.find_element(By.XPATH, '//*[@id="username"]').send_keys(phone)
+
+    def input_login_password(self):
+        password = get_value_of_config("sapo_password")
+        self.driver.find_element(By.XPATH, '//*[@id="password"]').send_keys(password)
+
+    def click_login_button(self):
+        self.driver.find_element(By.XPATH, '//*[@id="pos-login-form"]/div[4]/button').click()
+
+    def click_domain_shop(self):
+        if get_value_of_config('sapo_quoc_co_shop') in self.domain:
+            xpath = f'// span[text()="{get_value_of_config("sapo_quoc_co_shop")}"]/parent::div'
+        elif get_value_of_config('sapo_giang_shop') in self.domain:
+            xpath = f'// span[text()="{get_value_of_config("sapo_giang_shop")}"]/parent::div'
+        check_element_can_clickable(xpath, By.XPATH)
+        self.driver.find_element(By.XPATH, xpath).click()
+
+    def handle_windows(self):
+        sale_order = '//span[text()="Đơn hàng"]'
+        check_element_can_clickable(sale_order, By.XPATH)
+
+        default_window = self.driver.window_handles[0]
+        handle_window = self.driver.window_handles[1]
+        self.driver.switch_to.window(window_name=default_window)
+        self.driver.close()
+        self.driver.switch_to.window(window_name=handle_window)
+
+    def go_to_order_page(self):
+        sale_order = '//span[text()="Đơn hàng"]'
+        check_element_can_clickable(sale_order, By.XPATH)
+        self.driver.find_element(By.XPATH, sale_order).click()
+
+        admin_order = '//a[@href="/admin/orders"]'
+        check_element_can_clickable(admin_order, By.XPATH)
+        self.driver.find_element(By.XPATH, admin_order).click()
+
+    def get_website_cookie(self):
+        return {cookie['name']: cookie['value'] for cookie in self.driver.get_cookies()}
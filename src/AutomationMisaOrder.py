@@ -1,7 +1,7 @@
 import time
 from abc import ABC, abstractmethod
 
-from selenium.common import NoSuchElementException, ElementClickInterceptedException
+from selenium.common import NoSuchElementException, ElementClickInterceptedException, TimeoutException
 from selenium.webdriver import ActionChains
 from selenium.webdriver.common.by import By
 from selenium.webdriver.remote.webelement import WebElement
@@ -9,39 +9,48 @@ from selenium.webdriver.remote.webelement import WebElement
 from src.Exceptions import OrderError
 from src.Model.Order import Order
 from src.Singleton.AppConfig import AppConfig
+from src.Singleton.WaitEngine import WaitEngine
 from src.utils import set_up_logger, get_value_of_config, attempt_check_exist_by_xpath, \
     attempt_check_can_clickable_by_xpath, check_element_can_clickable, check_element_not_exist
 
 
 class AutomationMisaOrder(ABC):
-    def __init__(self, orders: list[Order]):
-        self.orders = orders
+    def __init__(self, driver=None):
         self.logging = set_up_logger("Middleware_Tool")
-        self.driver = AppConfig().chrome_driver
-        self.missing_orders = []
-        self.handle_orders = []
-        self.attempt = 1
+        self._driver = driver
+        self.wait_engine = WaitEngine()
+        self.added_skus = []
+
+    @property
+    def driver(self):
+        # A worker of the submission pool brings its own browser, otherwise the AppConfig one is used
+        if self._driver is None:
+            self._driver = AppConfig().chrome_driver
+        return self._driver
 
     @abstractmethod
-    def send_orders_to_misa(self):
+    def submit_order(self, order: Order) -> bool:
         pass
 
-    def _get_list_missing_orders(self) -> list[Order]:
-        return [o for o in self.orders if o.code not in self.handle_orders]
+    def open_session(self):
+        self._open_website()
+        self._authentication()
+        self.driver.maximize_window()
+        self._go_to_internal_accounting_data_page()
 
     def _escape_current_invoice(self):
         # Check balance modal
-        if not check_element_not_exist('//span[contains(@id, "idMessage") and contains(text(), "Tổng tiền thuế GTGT")]', timeout=30):
+        if not check_element_not_exist('//span[contains(@id, "idMessage") and contains(text(), "Tổng tiền thuế GTGT")]', timeout=30, driver=self.driver):
             yes_button_xpath = '//span[contains(@id, "idMessage") and contains(text(), "Tổng tiền thuế GTGT")]/ancestor::div[@class="ms-message-box--content"]/div[@class="mess-footer"]//button/div[contains(text(),"Không")]'
             self.driver.find_element(By.XPATH, yes_button_xpath).click()
 
         # Escape
-        if check_element_not_exist(element='ms-message-bg', timeout=30, type=By.CLASS_NAME):
-            attempt_check_can_clickable_by_xpath('//div[contains(@class,"close-btn header")]', max_attempt=15)
+        if check_element_not_exist(element='ms-message-bg', timeout=30, type=By.CLASS_NAME, driver=self.driver):
+            attempt_check_can_clickable_by_xpath('//div[contains(@class,"close-btn header")]', max_attempt=15, driver=self.driver)
             self.driver.find_element(By.XPATH, '//div[contains(@class,"close-btn header")]').click()
 
         # Check if existed after unit time
-        if not check_element_not_exist('//div[@class="title"]', timeout=30):
+        if not check_element_not_exist('//div[@class="title"]', timeout=30, driver=self.driver):
             self._escape_current_invoice()
 
     def _open_website(self):
@@ -63,7 +72,7 @@ class AutomationMisaOrder(ABC):
 
         # Click right collapse
         tooltip_collapse_xpath = '//div[@class ="collapse-btn right-collapse"]'
-        is_available = check_element_can_clickable(tooltip_collapse_xpath, By.XPATH)
+        is_available = check_element_can_clickable(tooltip_collapse_xpath, By.XPATH, driver=self.driver)
         if is_available:
             self.driver.find_element(By.XPATH, tooltip_collapse_xpath).click()
 
@@ -90,23 +99,23 @@ class AutomationMisaOrder(ABC):
     def _authentication(self):
         # Input email
         email_xpath = '//input[@name="username"]'
-        attempt_check_exist_by_xpath(email_xpath)
+        attempt_check_exist_by_xpath(email_xpath, driver=self.driver)
         self.driver.find_element(By.XPATH, email_xpath).send_keys(get_value_of_config("misa_login"))
 
         # Input password
         password_xpath = '//input[@name="pass"]'
-        attempt_check_exist_by_xpath(password_xpath)
+        attempt_check_exist_by_xpath(password_xpath, driver=self.driver)
         self.driver.find_element(By.XPATH, password_xpath).send_keys(get_value_of_config("misa_password"))
 
         # Click login button
         button_xpath = '//button[@objname="jBtnLogin"]'
-        attempt_check_can_clickable_by_xpath(button_xpath)
+        attempt_check_can_clickable_by_xpath(button_xpath, driver=self.driver)
         self.driver.find_element(By.XPATH, button_xpath).click()
 
         # Check_current_session
         session_xpath = '//div[text()="Tiếp tục đăng nhập"]/parent::button'
         try:
-            attempt_check_exist_by_xpath(session_xpath, max_attempt=2)
+            attempt_check_exist_by_xpath(session_xpath, max_attempt=2, driver=self.driver)
             self.driver.find_element(By.XPATH, session_xpath).click()
         except NoSuchElementException as e:
             self.logging.info(msg="No users use this account")
@@ -116,18 +125,37 @@ class AutomationMisaOrder(ABC):
     def _go_to_internal_accounting_data_page(self):
         current_db_name = get_value_of_config('header_current_db_name')
         db_button_xpath = '//div[@class="header-current-db-name"]'
-        attempt_check_exist_by_xpath(db_button_xpath)
+        attempt_check_exist_by_xpath(db_button_xpath, driver=self.driver)
         if self.driver.find_element(By.XPATH, db_button_xpath).text.strip() != current_db_name.strip():
             self.driver.find_element(By.XPATH, db_button_xpath).click()
             table_db_button = f'//p[@title="{current_db_name}"]//ancestor::table'
-            attempt_check_can_clickable_by_xpath(table_db_button)
+            attempt_check_can_clickable_by_xpath(table_db_button, driver=self.driver)
             self.driver.find_element(By.XPATH, table_db_button).click()
             attempt_check_exist_by_xpath(
-                '//div[@class="title-branch"]/following-sibling::div/div[@class="title-header"]')
+                '//div[@class="title-branch"]/following-sibling::div/div[@class="title-header"]', driver=self.driver)
+
+    def _add_table_row(self, add_line_button_xpath):
+        # Click "Thêm dòng" and wait for the new row instead of sleeping
+        rows_xpath = '//table[@class="ms-table"]/tbody/tr'
+        row_count = len(self.driver.find_elements(By.XPATH, rows_xpath))
+        self._action_click_with_xpath_(add_line_button_xpath)
+        self.wait_engine.wait_for_count(self.driver, rows_xpath, row_count + 1)
+
+    def _has_cell_error(self, error_icon_xpath) -> bool:
+        # MISA validates the cell with a request and may draw the icon after it: look for the icon until the
+        # settle deadline, not only once the page is idle
+        deadline = time.perf_counter() + min(self.wait_engine.get_timeout('cell validation', 10), 10)
+        self.wait_engine.settle(self.driver, 'cell validation', max_wait=10)
+        try:
+            return self.wait_engine.until(lambda: len(self.driver.find_elements(By.XPATH, error_icon_xpath)) > 0,
+                                          error_icon_xpath, timeout=max(0.0, deadline - time.perf_counter()),
+                                          extend=False)
+        except TimeoutException:
+            return False
 
     def _action_click_with_xpath_(self, xpath):
         try:
-            attempt_check_can_clickable_by_xpath(xpath)
+            attempt_check_can_clickable_by_xpath(xpath, driver=self.driver)
             self.driver.find_element(By.XPATH, xpath).click()
         except ElementClickInterceptedException as e:
             element = self.driver.find_element(By.XPATH, xpath)
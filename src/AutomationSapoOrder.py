@@ -1,23 +1,27 @@
 import datetime
 import json
 import math
-import time
-from typing import List
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Iterator
 
 import requests
-from selenium.common import NoSuchElementException
-from selenium.webdriver import Keys
-from selenium.webdriver.common.by import By
 
-from src.Enums import SapoShop, OrderStatus
+from src.Enums import SapoShop, OrderStatus, Channel
+from src.Factory.SapoAuthenticationFactory import create_sapo_authentication
+from src.HttpTransport import get_transport
 from src.IRetreiveOrder import SAPO
 from src.Model.Item import Item, CompositeItem
 from src.Model.Order import Order
 from src.OrderRequest import OrderRequest
-from src.Singleton.AppConfig import AppConfig
-from src.utils import get_value_of_config, set_up_logger, attempt_check_exist_by_xpath, \
-    attempt_check_can_clickable_by_xpath, check_element_can_clickable, get_item_information, parse_time_to_vietnam_zone, \
-    parse_time_to_GMT
+from src.OrderSyncState import OrderSyncState
+from src.Paginator import iter_pages_concurrently
+from src.ReferenceCache import ReferenceCache
+from src.SessionStore import SessionStore
+from src.Singleton.CatalogService import CatalogService
+from src.Singleton.OrderStore import OrderStore
+from src.utils import get_value_of_config, get_value_of_config_or_default, set_up_logger, \
+    parse_time_to_vietnam_zone, parse_time_to_GMT
 
 
 def _update_product_with_sub_product(product, item, sub_product):
@@ -28,222 +32,312 @@ def _update_product_with_sub_product(product, item, sub_product):
 
 
 class AutomationSapoOrder(SAPO):
+    page_limit = 100
+    variant_batch_size = 100
+    search_group_size = 50
+    search_page_limit = 250
 
     def __init__(self, order: OrderRequest, shop: SapoShop):
-        self.driver = AppConfig().chrome_driver
         self.logging = set_up_logger("Middleware_Tool")
         self.domain = self.get_domain(shop)
-        self.orders = []
+        pool_size = max(int(get_value_of_config_or_default('sapo_fetch_workers', 4)),
+                        int(get_value_of_config_or_default('sapo_search_workers', 8)))
+        self.transport = get_transport(self.domain, pool_size=pool_size)
+        shop_key = self.domain.split('://', 1)[-1]
+        self.session_store = SessionStore(shop_key)
+        self.authenticator = create_sapo_authentication(self.domain, self.transport)
         self.from_date = parse_time_to_GMT(order.from_date)
         self.to_date = parse_time_to_GMT(order.to_date)
         self.to_search_order = order.orders
         self.payment_methods = []
-        self.item_information = get_item_information()
+        self.catalog = CatalogService().catalog
         self.order_sources = []
+        reference_ttl = float(get_value_of_config_or_default('reference_cache_ttl_hours', 24)) * 3600
+        self.order_source_cache = ReferenceCache(f"order_sources_{shop_key}", reference_ttl)
+        self.payment_method_cache = ReferenceCache(f"payment_methods_{shop_key}", reference_ttl)
+        self.composite_variant_cache = ReferenceCache(f"composite_variants_{shop_key}", reference_ttl)
+        self.composite_variant_cache.clear_if_expired()
+        self._is_order_sources_refreshed = False
+        self._is_payment_methods_refreshed = False
         self.order_status = order.status
+        self.incremental = order.incremental
+        self.shop_key = shop_key
+        self.channel = f"sapo:{shop_key}"
+        self.order_store = OrderStore()
 
     def get_orders_by_date(self) -> List[Order]:
+        return list(self.iter_orders_by_date())
+
+    def get_orders_by_search_and_date(self) -> List[Order]:
+        return list(self.iter_orders_by_search_and_date())
+
+    def get_orders_by_search(self):
+        return list(self.iter_orders_by_search())
+
+    def iter_orders_by_date(self) -> Iterator[Order]:
         try:
-            self.open_website()
-            self.authentication()
-            self.click_domain_shop()
-            self.driver.maximize_window()
-            self.handle_windows()
-            self.go_to_order_page()
-            # Get payment method
-            self.payment_methods = self.get_payment_methods()
-            self.order_sources = self.get_order_sources()
-            self.filter_orders_date_time()
-            for order in self.orders:
-                try:
-                    self.get_information_order(order)
-                    self.get_order_source(order)
-                    self.get_payment_method(order)
-                    order.created_on = parse_time_to_vietnam_zone(order.created_on)
-                except Exception as e:
-                    self.logging.critical(msg=f"[Date]Automation Sapo Order got error at get at order {order.code} "
-                                              f"by date: {e}")
+            self.prepare_reference_data()
+            for orders_json in self.iter_synced_orders():
+                yield from self.load_orders(orders_json, "[Date]")
         except Exception as e:
             self.logging.critical(msg=f"[Date]Automation Sapo Order got error at get orders by date: {e}")
-        finally:
-            AppConfig().destroy_instance()
-            return self.orders
 
-    def get_orders_by_search_and_date(self) -> List[Order]:
+    def iter_orders_by_search_and_date(self) -> Iterator[Order]:
         try:
-            self.open_website()
-            self.authentication()
-            self.click_domain_shop()
-            self.driver.maximize_window()
-            self.handle_windows()
-            self.go_to_order_page()
-            # Get payment method
-            self.payment_methods = self.get_payment_methods()
-            self.order_sources = self.get_order_sources()
-            is_empty_search = len(self.to_search_order) > 0
-            self.filter_orders_date_time(is_available_search_order=is_empty_search)
-            self.search_order()
+            self.prepare_reference_data()
+            search_orders = set(self.to_search_order)
+            for orders_json in self.iter_order_json_pages(self.get_order_query()):
+                if search_orders:
+                    # The page already holds the full order, keep the searched ones instead of searching them again
+                    orders_json = [order for order in orders_json if order.get('code') in search_orders]
+                yield from self.load_orders(orders_json, "[Search and Date]")
         except Exception as e:
             self.logging.critical(
                 msg=f"[Search and Date] Automation Sapo Order got error at get orders by search and date: {e}")
-        finally:
-            AppConfig().destroy_instance()
-            return self.orders
 
-    def get_orders_by_search(self):
+    def iter_orders_by_search(self) -> Iterator[Order]:
         try:
-            self.open_website()
-            self.authentication()
-            self.click_domain_shop()
-            self.driver.maximize_window()
-            self.handle_windows()
-            self.go_to_order_page()
-            # Get payment method
-            self.payment_methods = self.get_payment_methods()
-            self.order_sources = self.get_order_sources()
-            self.search_order()
+            self.prepare_reference_data()
+            yield from self.search_order()
         except Exception as e:
             self.logging.critical(msg=f"[Search] Automation Sapo Order got error at get orders by search: {e}")
-        finally:
-            AppConfig().destroy_instance()
-            return self.orders
-
-    def go_to_order_page(self):
-        sale_order = '//span[text()="Đơn hàng"]'
-        check_element_can_clickable(sale_order, By.XPATH)
-        self.driver.find_element(By.XPATH, sale_order).click()
-
-        admin_order = '//a[@href="/admin/orders"]'
-        check_element_can_clickable(admin_order, By.XPATH)
-        self.driver.find_element(By.XPATH, admin_order).click()
-
-    def handle_windows(self):
-        sale_order = '//span[text()="Đơn hàng"]'
-        check_element_can_clickable(sale_order, By.XPATH)
-
-        default_window = self.driver.window_handles[0]
-        handle_window = self.driver.window_handles[1]
-        self.driver.switch_to.window(window_name=default_window)
-        self.driver.close()
-        self.driver.switch_to.window(window_name=handle_window)
-
-    def search_with_orders(self):
-        pass
-
-    def open_website(self):
-        url = get_value_of_config("sapo_url")
-        self.driver.get(url)
-
-    def authentication(self):
-        self.input_login_phone()
-        self.input_login_password()
-        self.click_login_button()
-
-    def input_login_phone(self):
-        phone = get_value_of_config("sapo_phone")
-        self.driver.find_element(By.XPATH, '//*[@id="username"]').send_keys(phone)
-
-    def input_login_password(self):
-        password = get_value_of_config("sapo_password")
-        self.driver.find_element(By.XPATH, '//*[@id="password"]').send_keys(password)
-
-    def click_login_button(self):
-        self.driver.find_element(By.XPATH, '//*[@id="pos-login-form"]/div[4]/button').click()
-
-    def click_domain_shop(self):
-        if get_value_of_config('sapo_quoc_co_shop') in self.domain:
-            xpath = f'// span[text()="{get_value_of_config("sapo_quoc_co_shop")}"]/parent::div'
-        elif get_value_of_config('sapo_giang_shop') in self.domain:
-            xpath = f'// span[text()="{get_value_of_config("sapo_giang_shop")}"]/parent::div'
-        check_element_can_clickable(xpath, By.XPATH)
-        self.driver.find_element(By.XPATH, xpath).click()
-
-    def filter_orders_date_time(self, is_available_search_order=False):
-        limit = 100
-
-        meta_data = self.get_meta_order_from_page()
-        total_page = math.ceil(meta_data.get("total") / limit)
-
-        for page in range(1, total_page + 1 if total_page > 1 else 2):
-            list_order = self.get_list_order_from_page(page)
-
-            if not is_available_search_order:
-                self.orders.extend(list_order)
-                self.to_search_order.extend([order.code for order in list_order])
-            else:
-                list_current_orders = [order.code for order in list_order]
-                self.to_search_order = list(set(self.to_search_order) & set(list_current_orders))
-
-    def get_list_order_from_page(self, page):
-        command_status = "&composite_fulfillment_status=fulfilled" if self.order_status == OrderStatus.SHIPPING \
-                            else "&status=completed"
-        string_json = requests.get(f'{self.domain}/admin/orders.json?page={page}'
-                                   f'&limit=100'
-                                   f'{command_status}'
-                                   f'&created_on_max={self.to_date}'
-                                   f'&created_on_min={self.from_date}'
-                                   f'&return_status=unreturned'
-                                   # f'&source_id=6671550,6671547,6671556,6671548',
-                                   f'&source_id={self.order_sources}',
-                                   cookies=self.get_website_cookie())
-        parse_json = json.loads(string_json.text)['orders']
-        return [Order.from_dict(order) for order in parse_json]
-
-    def get_meta_order_from_page(self):
-        command_status = "&composite_fulfillment_status=fulfilled" if self.order_status == OrderStatus.SHIPPING \
-            else "&status=completed"
-        string_json = requests.get(f'{self.domain}/admin/orders.json?page=1'
-                                   f'&limit=100'
-                                   f'{command_status}'
-                                   f'&created_on_max={self.to_date}'
-                                   f'&created_on_min={self.from_date}', cookies=self.get_website_cookie())
-        return json.loads(string_json.text)['metadata']
+
+    def prepare_reference_data(self):
+        self.start_session()
+        # Get payment method
+        self.payment_methods = self.get_payment_methods()
+        self.order_sources = self.get_order_sources()
+
+    def start_session(self):
+        self.transport.set_cookie_provider(self.login)
+        cookies = self.session_store.load()
+        if cookies is not None:
+            self.transport.use_cookies(cookies)
+
+        # Reuse the stored session, or the one of a previous search in this process, while it is valid
+        if self.transport.has_cookies():
+            if self.is_session_alive():
+                return
+            self.logging.info(msg=f"[Session] Session of {self.domain} expired, logging in again")
+            self.session_store.clear()
+        self.transport.refresh_cookies()
+
+    def is_session_alive(self) -> bool:
+        try:
+            response = self.transport.get(f'{self.domain}/admin/orders.json?page=1&limit=1', authenticate=False,
+                                          allow_redirects=False)
+            return response.status_code == 200 and 'orders' in json.loads(response.text)
+        except (requests.RequestException, ValueError):
+            return False
+
+    def login(self):
+        cookies = self.authenticator.login()
+        if self.authenticator.is_persistent:
+            self.session_store.save(cookies)
+        return cookies
+
+    def iter_order_json_pages(self, query):
+        # Page 1 carries the metadata of the same filtered query, the other pages are fetched concurrently
+        first_page = self.get_order_page(1, query)
+        total_page = math.ceil(first_page['metadata'].get("total") / self.page_limit)
+        workers = int(get_value_of_config_or_default('sapo_fetch_workers', 4))
+        yield from iter_pages_concurrently(lambda page: self.get_order_page(page, query)['orders'],
+                                           first_page['orders'], total_page, workers)
+
+    def get_order_query(self):
+        query = {'composite_fulfillment_status': 'fulfilled'} if self.order_status == OrderStatus.SHIPPING \
+            else {'status': 'completed'}
+        query.update({'created_on_max': self.to_date,
+                      'created_on_min': self.from_date,
+                      'return_status': 'unreturned',
+                      'source_id': self.order_sources})
+        return query
+
+    def get_order_page(self, page, query):
+        string_json = self.transport.get(f'{self.domain}/admin/orders.json',
+                                         params={'page': page, 'limit': self.page_limit, **query})
+        return json.loads(string_json.text)
+
+    def iter_synced_orders(self) -> Iterator[List[dict]]:
+        # Every date search goes through the sync state of this shop and status in the order store
+        sync_state = OrderSyncState(f"{self.shop_key}_{self.order_status.name}", self.channel,
+                                    lambda order: order['created_on'])
+        max_age = float(get_value_of_config_or_default('order_store_ttl_hours', 24)) * 3600
+        if sync_state.is_fresh(self.from_date, self.to_date, self.order_sources, max_age):
+            self.logging.info(msg=f"[Sync] {self.domain} {self.order_status.name}: re-opened from the order store")
+        elif self.incremental and sync_state.can_resume(self.from_date, self.order_sources):
+            # Only the orders changed since the last sync, without the status filters, so orders that
+            # left the filter are dropped from the local set
+            query = {'created_on_min': sync_state.covered_from,
+                     'created_on_max': max(self.to_date, sync_state.covered_to),
+                     'modified_on_min': self.get_modified_since(sync_state.watermark),
+                     'source_id': self.order_sources}
+            for orders_json in self.iter_order_json_pages(query):
+                for order_json in orders_json:
+                    sync_state.merge(order_json, self.is_order_in_filter(order_json), order_json.get('modified_on'))
+            self.save_sync_state(sync_state, query)
+        else:
+            # The whole window is downloaded again, its pages are the result and are yielded as they come
+            sync_state.reset(self.from_date, self.to_date, self.order_sources)
+            query = self.get_order_query()
+            for orders_json in self.iter_order_json_pages(query):
+                for order_json in orders_json:
+                    sync_state.merge(order_json, True, order_json.get('modified_on'))
+                yield orders_json
+            self.save_sync_state(sync_state, query)
+            return
+
+        orders_json = sync_state.get_orders_between(self.from_date, self.to_date)
+        for start in range(0, len(orders_json), self.page_limit):
+            yield orders_json[start:start + self.page_limit]
+
+    def save_sync_state(self, sync_state: OrderSyncState, query):
+        sync_state.extend_to(self.to_date)
+        sync_state.save(synced_until=datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'))
+        self.logging.info(msg=f"[Sync] {self.domain} {self.order_status.name}: {sync_state.changed_count} changed "
+                              f"orders since {query.get('modified_on_min', 'the beginning')}")
+
+    @staticmethod
+    def get_modified_since(watermark):
+        # Overlap the previous sync a little, against clock skew and orders changed while it was paginating
+        overlap = float(get_value_of_config_or_default('sync_overlap_minutes', 5))
+        modified_since = datetime.datetime.strptime(watermark, '%Y-%m-%dT%H:%M:%SZ') - datetime.timedelta(
+            minutes=overlap)
+        return modified_since.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    def is_order_in_filter(self, order_json):
+        if self.order_status == OrderStatus.SHIPPING:
+            is_status_matched = order_json.get('composite_fulfillment_status') == 'fulfilled'
+        else:
+            is_status_matched = order_json.get('status') == 'completed'
+        return (is_status_matched and order_json.get('return_status') == 'unreturned'
+                and str(order_json.get('source_id')) in self.order_sources.split(','))
 
     def get_order_sources(self):
-        string_json = requests.get(f'{self.domain}/admin/order_sources.json?query=&page=1'
-                                   f'&limit=100',
-                                   cookies=self.get_website_cookie())
-        order_sources = json.loads(string_json.text)['order_sources']
+        if self.order_source_cache.is_expired():
+            self._download_order_sources()
         default_sources = get_value_of_config('order_sources').split(',')
-        id_sources = [str(sources.get("id")) for sources in order_sources if sources.get("name") in default_sources]
+        id_sources = [str(sources.get("id")) for sources in self.order_source_cache.values()
+                      if sources.get("name") in default_sources]
         return ','.join(id_sources)
 
-
-    def search_order(self):
-        for order in self.to_search_order:
-            time.sleep(2)
-            self.driver.get(f'{self.domain}/admin/orders')
-            search_xpath = '//input[contains(@id,"Sapo-TextField")]'
-
-            attempt_check_exist_by_xpath(search_xpath)
-            search_input = self.driver.find_element(By.XPATH, search_xpath)
-            search_input.send_keys(order)
-            search_input.send_keys(Keys.ENTER)
-
-            order_xpath = f'//table[@class="MuiTable-root"]/tbody/tr[1]/td/p/a[text()="{order}"]'
+    def _download_order_sources(self):
+        string_json = self.transport.get(f'{self.domain}/admin/order_sources.json?query=&page=1'
+                                         f'&limit=100')
+        order_sources = json.loads(string_json.text)['order_sources']
+        self.order_source_cache.replace({sources.get("id"): sources for sources in order_sources})
+        self._is_order_sources_refreshed = True
+
+
+    def search_order(self) -> Iterator[Order]:
+        # Orders downloaded recently come from the order store, the others are resolved through
+        # orders.json with the logged-in session. Its query is a partial text match of one value and its
+        # ids filter takes internal ids, so codes cannot be looked up several per request: a group of
+        # codes is searched concurrently and every result page is matched against the whole group
+        max_age = float(get_value_of_config_or_default('order_store_ttl_hours', 24)) * 3600
+        codes = []
+        for code in dict.fromkeys(self.to_search_order):
+            order_json = self.order_store.find_by_code(self.channel, code, max_age)
+            if order_json is None:
+                codes.append(code)
+            else:
+                yield from self.load_orders([order_json], "[Search]")
+
+        workers = int(get_value_of_config_or_default('sapo_search_workers', 8))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for start in range(0, len(codes), self.search_group_size):
+                group = codes[start:start + self.search_group_size]
+                found = self.find_orders_by_codes(group, executor)
+                for code in group:
+                    if code not in found:
+                        self.logging.error(msg=f"[Searching Order]: Cannot find order {code} in the Sapo")
+
+                yield from self.load_orders([found[code] for code in group if code in found], "[Search]")
+
+    def find_orders_by_codes(self, codes: List[str], executor: ThreadPoolExecutor) -> dict:
+        # code -> order JSON; a code already seen in the results of another code of the group is not queried
+        found, wanted_codes = {}, set(codes)
+        found_lock = threading.Lock()
+        list(executor.map(lambda code: self.find_order_by_code(code, wanted_codes, found, found_lock), codes))
+        return found
+
+    def find_order_by_code(self, code, wanted_codes: set, found: dict, found_lock: threading.Lock):
+        # The query matches codes partially and other fields too: page until the exact code or the last page
+        page = 1
+        while True:
+            with found_lock:
+                if code in found:
+                    return
             try:
-                attempt_check_can_clickable_by_xpath(order_xpath)
-                self.driver.find_element(By.XPATH, order_xpath).click()
-                self.get_order_json()
-            except NoSuchElementException:
-                self.logging.error(msg=f"[Searching Order]: Cannot find order {order} in the Sapo")
-
-    def get_order_json(self):
-        xpath = "//pre"
-        self.driver.get(self.driver.current_url + '.json')
-        attempt_check_exist_by_xpath(xpath)
-        string_json = self.driver.find_element(By.XPATH, xpath).get_attribute("innerHTML")
-        parse_json = json.loads(string_json)['order']
-        order = Order.from_dict(parse_json)
-
-        self.get_information_order(order)
-        self.get_order_source(order)
-        self.get_payment_method(order)
-        order.created_on = parse_time_to_vietnam_zone(order.created_on)
-        self.orders.append(order)
-
-    def get_website_cookie(self):
-        return {cookie['name']: cookie['value'] for cookie in self.driver.get_cookies()}
+                response = self.transport.get(f'{self.domain}/admin/orders.json',
+                                              params={'query': code, 'page': page, 'limit': self.search_page_limit})
+                response.raise_for_status()
+                orders = json.loads(response.text)['orders']
+            except (requests.RequestException, ValueError, KeyError) as e:
+                self.logging.error(msg=f"[Searching Order]: Cannot search order {code} in the Sapo: {e}")
+                return
+            with found_lock:
+                for order in orders:
+                    if order.get('code') in wanted_codes:
+                        found.setdefault(order['code'], order)
+                if code in found or len(orders) < self.search_page_limit:
+                    return
+            page += 1
+
+    def load_orders(self, orders_json: List[dict], log_prefix: str) -> List[Order]:
+        # Orders already enriched against the current references come back from the order store as they are
+        orders, downloaded = [], []
+        for order_json in orders_json:
+            enriched_json = self.order_store.get_enriched(self.channel, order_json,
+                                                          self.get_enrichment_hash(order_json))
+            if enriched_json is not None:
+                order = Order.from_json(enriched_json)
+            else:
+                order = Order.from_dict(order_json)
+                downloaded.append((order_json, order))
+            order.origin = self.channel
+            order.origin_channel = Channel.SAPO
+            orders.append(order)
+
+        failed = self.enrich_orders([order for _, order in downloaded], log_prefix)
+        # References looked up one by one during the enrichment are written once per page
+        self.composite_variant_cache.flush()
+        self.order_source_cache.flush()
+        # Hashed after the enrichment, which may have refreshed the references it used
+        self.order_store.save(self.channel,
+                              [(order_json, order.to_json() if index not in failed else None,
+                                self.get_enrichment_hash(order_json))
+                               for index, (order_json, order) in enumerate(downloaded)])
+        return orders
+
+    def get_enrichment_hash(self, order_json: dict):
+        # Everything the enrichment reads: the catalog, the payment methods, the order sources and the
+        # components of the combos of the order
+        if self.catalog.source_hash is None:
+            return None
+        variant_ids = sorted({str(item.get('variant_id')) for item in order_json.get('order_line_items') or []
+                              if item.get('is_composite')})
+        return self.order_store.get_hash({
+            'catalog': self.catalog.source_hash,
+            'payment_methods': self.payment_method_cache.items,
+            'order_sources': self.order_source_cache.items,
+            'composite_items': {variant_id: self.composite_variant_cache.get(variant_id)
+                                for variant_id in variant_ids}})
+
+    def enrich_orders(self, orders: List[Order], log_prefix: str) -> set[int]:
+        # Returns the indexes of the orders that could not be enriched
+        self.prefetch_composite_items(orders)
+        failed = set()
+        for index, order in enumerate(orders):
+            try:
+                self.get_information_order(order)
+                self.get_order_source(order)
+                self.get_payment_method(order)
+                order.created_on = parse_time_to_vietnam_zone(order.created_on)
+            except Exception as e:
+                failed.add(index)
+                self.logging.critical(msg=f"{log_prefix}Automation Sapo Order got error at get at order {order.code}: {e}")
+        return failed
 
     def get_information_order(self, order):
         for item in order.order_line_items:
@@ -253,16 +347,14 @@ class AutomationSapoOrder(SAPO):
             # Check sku in composite process
             if item.is_composite:
                 self._process_composite_item(item)
-            elif item.sku in list(set(i.Item_Id for i in self.item_information)):
+            elif self.catalog.has_item(item.sku):
                 self.get_combo_item(item=item)
             elif information_item is not None:
                 self._update_item_from_information(item, information_item)
 
     def get_combo_item(self, item: Item):
-        list_composite_item = [it for it in self.item_information if item.sku == it.Item_Id]
-        composite_item = list_composite_item[0]
         item.is_composite = True
-        for detail in composite_item.Product:
+        for detail in self.catalog.get_composition(item.sku):
             item.composite_item_domains.append(
                 CompositeItem(price=detail.Price_not_VAT,
                               sku=detail.Product_Id,
@@ -277,17 +369,31 @@ class AutomationSapoOrder(SAPO):
                 if str(product.product_id) == str(sub_product["sub_product_id"]):
                     self._update_product_from_sub_product(product, item, sub_product)
 
+    def prefetch_composite_items(self, orders: List[Order]):
+        # Resolve every distinct combo variant of the result set with a few batched ids= requests
+        variant_ids = {str(item.variant_id) for order in orders for item in order.order_line_items
+                       if item.is_composite}
+        self._download_composite_items([variant_id for variant_id in variant_ids
+                                        if self.composite_variant_cache.get(variant_id) is None])
+
     def _fetch_composite_items(self, variant_id):
-        try:
-            response = requests.get(
-                f"{self.domain}/admin/variants/search.json?page=1&limit=250&status=active%2Cinactive%2Cdeleted&ids={variant_id}",
-                cookies=self.get_website_cookie()
-            )
-            response.raise_for_status()
-            return json.loads(response.text)['variants'][0]['composite_items']
-        except requests.RequestException as e:
-            print(f"Error fetching composite items: {e}")
-            return []
+        if self.composite_variant_cache.get(variant_id) is None:
+            self._download_composite_items([str(variant_id)])
+        return self.composite_variant_cache.get(variant_id) or []
+
+    def _download_composite_items(self, variant_ids: List[str]):
+        for start in range(0, len(variant_ids), self.variant_batch_size):
+            batch = variant_ids[start:start + self.variant_batch_size]
+            try:
+                response = self.transport.get(
+                    f"{self.domain}/admin/variants/search.json?page=1&limit=250&status=active%2Cinactive%2Cdeleted&ids={','.join(batch)}"
+                )
+                response.raise_for_status()
+                variants = json.loads(response.text)['variants']
+                self.composite_variant_cache.update(
+                    {variant['id']: variant.get('composite_items') or [] for variant in variants})
+            except requests.RequestException as e:
+                self.logging.error(msg=f"Error fetching composite items of variants {','.join(batch)}: {e}")
 
     def _update_product_from_sub_product(self, product, item, sub_product):
         information_sub_item = self.find_item_by_sub_id(item.barcode, sub_product["sub_sku"])
@@ -313,43 +419,53 @@ class AutomationSapoOrder(SAPO):
 
     # Function to find item by Item_Id
     def find_item_by_id(self, item_id):
-        try:
-            return [item for item in self.item_information if item.Item_Id == item_id][0]
-        except:
-            return None
+        return self.catalog.find_item(item_id)
 
     def find_item_by_sub_id(self, item_id, product_id):
-        for item in self.item_information:
-            if item.Item_Id == item_id:
-                sub_product = [sub_item for sub_item in item.Product if sub_item.Product_Id == product_id]
-                if len(sub_product) > 0:
-                    return sub_product[0]
-        return None
+        return self.catalog.find_sub_product(item_id, product_id)
 
     def get_payment_method(self, order):
         # Get method name
         for payment in order.fulfillments[0].payments:
-            for payment_method in self.payment_methods:
-                if payment.payment_method_id == str(payment_method['id']):
-                    payment.payment_method_name = payment_method['name']
+            payment_method = self.payment_method_cache.get(payment.payment_method_id)
+            if payment_method is None and not self._is_payment_methods_refreshed:
+                # Unknown id: the cached list is stale, download it once for this run
+                self._download_payment_methods()
+                payment_method = self.payment_method_cache.get(payment.payment_method_id)
+            if payment_method is not None:
+                payment.payment_method_name = payment_method['name']
 
     def get_payment_methods(self):
-        string_json = requests.get(
-            f"{self.domain}/admin/payment_methods.json?in_types=online%2Ccash%2Cmpos%2Ctransfer%2Cpoint%2Ccod%2Cpayment_gateway%2Cqr_code%2Cinstallment%2Cpayment_portal%2Cvietqr_basic&include_inactive=true",
-            cookies=self.get_website_cookie())
+        if self.payment_method_cache.is_expired():
+            self._download_payment_methods()
+        return self.payment_method_cache.values()
+
+    def _download_payment_methods(self):
+        string_json = self.transport.get(
+            f"{self.domain}/admin/payment_methods.json?in_types=online%2Ccash%2Cmpos%2Ctransfer%2Cpoint%2Ccod%2Cpayment_gateway%2Cqr_code%2Cinstallment%2Cpayment_portal%2Cvietqr_basic&include_inactive=true")
         string_json = json.loads(string_json.text)['payment_methods']
-        return string_json
+        self.payment_method_cache.replace({payment_method['id']: payment_method for payment_method in string_json})
+        self._is_payment_methods_refreshed = True
 
     def get_order_source(self, order: Order):
-        json_request = requests.get(f"{self.domain}/admin/order_sources/{order.source_id}.json",
-                                    cookies=self.get_website_cookie())
-        string_json = json.loads(json_request.text)['order_source']
-        order.source_name = string_json['name']
+        order_source = self.order_source_cache.get(order.source_id)
+        if order_source is None and not self._is_order_sources_refreshed:
+            # Unknown id: the cached list is stale, download it once for this run
+            self._download_order_sources()
+            order_source = self.order_source_cache.get(order.source_id)
+        if order_source is None:
+            json_request = self.transport.get(f"{self.domain}/admin/order_sources/{order.source_id}.json")
+            order_source = json.loads(json_request.text)['order_source']
+            self.order_source_cache.update({order.source_id: order_source})
+        order.source_name = order_source['name']
 
     @staticmethod
     def get_domain(shop: SapoShop):
         if shop == SapoShop.QuocCoQuocNghiepShop:
-            return f"https://{get_value_of_config('sapo_quoc_co_shop')}"
+            domain = get_value_of_config('sapo_quoc_co_shop')
         elif shop == SapoShop.ThaoDuocGiang:
-            return f"https://{get_value_of_config('sapo_giang_shop')}"
-        return ''
+            domain = get_value_of_config('sapo_giang_shop')
+        else:
+            return ''
+        # A value with its scheme (http://127.0.0.1:8000 for a stand-in server) is used as it is
+        return domain if '://' in domain else f"https://{domain}"
@@ -1,9 +1,11 @@
+import queue
+import threading
 import time
 from typing import List
 
+from selenium.common import NoSuchElementException
 from selenium.webdriver import Keys
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.select import Select
 
 from src.IRetreiveOrder import Web
 from src.Model.Customer.Address import Address
@@ -12,40 +14,154 @@ from src.Model.Fulfillment.Fulfillment import Fulfillment
 from src.Model.Fulfillment.FulfillmentItem import FulfillmentItem
 from src.Model.Item import Item, CompositeItem
 from src.Model.Order import Order
+from src.ReferenceCache import ReferenceCache
 from src.Singleton.AppConfig import AppConfig
-from src.utils import set_up_logger, get_value_of_config, attempt_check_exist_by_xpath, \
-    attempt_check_can_clickable_by_xpath, check_element_exist
+from src.utils import set_up_logger, get_value_of_config, get_value_of_config_or_default, \
+    attempt_check_exist_by_xpath, attempt_check_can_clickable_by_xpath, check_element_exist
+
+# [name, sku, is combo] of every row of the product list, empty strings for the missing cells
+_PRODUCT_ROWS_SCRIPT = """
+return Array.from(document.querySelectorAll('#m-datatable-list tbody tr')).map(function (row) {
+    var links = Array.from(row.querySelectorAll('td span a'));
+    var name = links.find(function (link) { return link.textContent.indexOf('Edit Combo') < 0; });
+    var sku = row.querySelector('td[data-field="sku"]');
+    return [name ? name.textContent.trim() : '',
+            sku ? sku.textContent.trim() : '',
+            links.some(function (link) { return link.textContent.indexOf('Edit Combo') >= 0; })];
+});
+"""
+
+
+# Order time shown on the order page, read before opening the edit form
+_ORDER_CREATED_ON_SCRIPT = """
+var cell = document.evaluate('//table[contains(@class,"m-datatable")]/tbody/tr/td[contains(.,"Thời Gian Đặt Hàng")]'
+                             + '/following-sibling::td', document, null, XPathResult.FIRST_ORDERED_NODE_TYPE,
+                             null).singleNodeValue;
+return cell ? cell.innerText.trim() : '';
+"""
+
+# Whole edit form of an order and its line items in one round-trip, same locators as the form fields
+_ORDER_FORM_SCRIPT = """
+function node(xpath, context) {
+    return document.evaluate(xpath, context || document, null, XPathResult.FIRST_ORDERED_NODE_TYPE,
+                             null).singleNodeValue;
+}
+function value(xpath, context) {
+    var element = node(xpath, context);
+    return element ? element.value : '';
+}
+function text(xpath, context) {
+    var element = node(xpath, context);
+    return element ? element.innerText.trim() : '';
+}
+function selected(name) {
+    var element = document.getElementsByName(name)[0];
+    return element && element.selectedIndex >= 0 ? element.options[element.selectedIndex].text.trim() : '';
+}
+var rows = document.evaluate('//*[@id="body_order"]/div[2]/table/tbody/tr', document, null,
+                             XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+var items = [];
+for (var i = 0; i < rows.snapshotLength; i++) {
+    var row = rows.snapshotItem(i);
+    items.push({
+        name: text('td[1]/a', row),
+        quantity: value('td[2]//*[@name="quantity"]', row),
+        unit_price: value('td[3]//*[contains(concat(" ", normalize-space(@class), " "), " product_price ")]', row),
+        price: text('td[4]//span', row)
+    });
+}
+return {
+    code: value('//input[@name="uid"]'),
+    total: text('//*[@id="total_money"]'),
+    state: selected('state'),
+    customer_name: value('//*[@id="customer_name"]'),
+    customer_email: value('//*[@id="customer_email"]'),
+    customer_phone: value('//*[@id="customer_phone"]'),
+    customer_province: selected('customer_province'),
+    customer_district: selected('customer_district'),
+    customer_ward: selected('customer_ward'),
+    customer_address: value('//*[@id="customer_address"]'),
+    customer_note: value('//*[@id="customer_remark"]'),
+    items: items
+};
+"""
 
 
 class AutomationWebOrder(Web):
-    def __init__(self):
-        self.driver = AppConfig().chrome_driver
+    def __init__(self, driver=None):
+        self._driver = driver
         self.is_processed = False
         self.logging = set_up_logger("Middleware_Tool")
         self.orders = []
+        # Product name -> SKU and combo name -> components (empty for a plain product), shared across runs
+        index_ttl = float(get_value_of_config_or_default('web_product_index_ttl_hours', 24)) * 3600
+        self.sku_index = ReferenceCache("web_product_skus", index_ttl)
+        self.combo_index = ReferenceCache("web_product_combos", index_ttl)
+
+    @property
+    def driver(self):
+        # Without a driver the scraper uses the Chrome of AppConfig, a pool worker brings its own
+        return self._driver or AppConfig().chrome_driver
 
     def get_orders_by_search(self, orders: List[str]):
+        # Codes are shared by a pool of logged-in browsers, each worker takes the next code when it is free
+        if not orders:
+            return []
+        pool_size = max(1, min(int(get_value_of_config_or_default('web_browser_pool_size', 3)), len(orders)))
+        codes = queue.Queue()
+        for index, order in enumerate(orders):
+            codes.put((index, order))
+        results = {}
+        workers = [threading.Thread(target=self._scrape_orders, args=(worker, codes, results),
+                                    name=f"WebOrderScraper-{worker}", daemon=True)
+                   for worker in range(pool_size)]
+        with self.sku_index, self.combo_index:
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+        self.orders = [results[index] for index in sorted(results)]
+        return self.orders
+
+    def _scrape_orders(self, worker, codes: queue.Queue, results: dict):
+        driver = None
         try:
-            url = get_value_of_config("website_url")
-            self.driver.get(url)
-
-            # Authentication
-            self.authentication()
-            self.driver.maximize_window()
-
-            # Switch to order admin page
-            time.sleep(2)
-            self.driver.get(f"{url}/order")
-
-            for order in orders:
-                self.open_website(order)
-                time.sleep(2)
-
+            driver = AppConfig.create_chrome_driver()
+            driver.set_page_load_timeout(int(get_value_of_config_or_default('web_page_load_timeout', 60)))
+            scraper = AutomationWebOrder(driver)
+            # Indexes are shared so every worker benefits from what the others resolved
+            scraper.sku_index = self.sku_index
+            scraper.combo_index = self.combo_index
+            scraper.login()
+            if worker == 0 and self.sku_index.is_expired():
+                scraper.refresh_product_index()
+
+            while True:
+                try:
+                    index, code = codes.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    results[index] = scraper.open_website(code)
+                except Exception as e:
+                    # A stuck or broken page only loses its own order
+                    self.logging.error(msg=f"[Web Scraper {worker}] Cannot get order {code}: {e}")
         except Exception as e:
-            self.logging.critical(f"Automation Web Order got error: {e}")
+            # The codes left in the queue are taken by the other workers
+            self.logging.critical(msg=f"[Web Scraper {worker}] Automation Web Order got error: {e}")
         finally:
-            AppConfig().destroy_instance()
-            return self.orders
+            if driver is not None:
+                driver.quit()
+
+    def login(self):
+        url = get_value_of_config("website_url")
+        self.driver.get(url)
+
+        # Authentication
+        self.authentication()
+        self.driver.maximize_window()
+        time.sleep(2)
 
     def authentication(self):
         self.input_login_email()
@@ -65,7 +181,7 @@ class AutomationWebOrder(Web):
 
     def open_website(self, order):
         # Search order
-        self.search_order(order)
+        return self.search_order(order)
 
     def search_order(self, order):
         state_complete_url = f'{get_value_of_config("website_url")}/order/?state=complete&payment='
@@ -73,56 +189,42 @@ class AutomationWebOrder(Web):
 
         # Searching
         search_input_xpath = '//*[@id="m_form_search"]'
-        attempt_check_exist_by_xpath(search_input_xpath)
+        attempt_check_exist_by_xpath(search_input_xpath, driver=self.driver)
 
         search_input = self.driver.find_element(By.XPATH, search_input_xpath)
         search_input.send_keys(order)
         search_input.send_keys(Keys.F9)
 
         order_xpath = '//table[@id="m-datatable-list"]/tbody/tr/td[@data-field="uid"]/span/a'
-        attempt_check_can_clickable_by_xpath(order_xpath)
+        attempt_check_can_clickable_by_xpath(order_xpath, driver=self.driver)
         self.driver.find_element(By.XPATH, order_xpath).click()
-        self.get_order_json()
+        return self.get_order_json()
 
     def get_order_json(self):
         id = self.driver.current_url.replace(f'{get_value_of_config("website_url")}/order/', '')
-        created_on = self.driver.find_element(By.XPATH,
-                                              '//table[contains(@class,"m-datatable")]/tbody/tr/td[contains(.,'
-                                              '"Thời Gian Đặt Hàng")]/following-sibling::td').text
+        created_on = self.driver.execute_script(_ORDER_CREATED_ON_SCRIPT)
 
         # Go to update button
         update_btn_xpath = '//button/i[contains(.,"Sửa")]'
-        attempt_check_can_clickable_by_xpath(update_btn_xpath)
+        attempt_check_can_clickable_by_xpath(update_btn_xpath, driver=self.driver)
         self.driver.find_element(By.XPATH, update_btn_xpath).click()
 
-        # Payment
-        code = self.driver.find_element(By.XPATH, '//input[@name="uid"]').get_attribute(
-            'value')
-        total_cost = self.driver.find_element(By.XPATH, '//*[@id="total_money"]').text
-        status_payment = Select(self.driver.find_element(By.NAME, 'state')).first_selected_option.text
-        method_payment = Select(self.driver.find_element(By.NAME, 'payment_method')).first_selected_option.text
-
-        # Customer
-        customer_name = self.driver.find_element(By.XPATH, '//*[@id="customer_name"]').get_attribute('value')
-        customer_email = self.driver.find_element(By.XPATH, '//*[@id="customer_email"]').get_attribute('value')
-        customer_phone = self.driver.find_element(By.XPATH, '//*[@id="customer_phone"]').get_attribute('value')
-        customer_province = Select(self.driver.find_element(By.NAME, 'customer_province')).first_selected_option.text
-        customer_district = Select(self.driver.find_element(By.NAME, 'customer_district')).first_selected_option.text
-        customer_ward = Select(self.driver.find_element(By.NAME, 'customer_ward')).first_selected_option.text
-        customer_address = self.driver.find_element(By.XPATH, '//*[@id="customer_address"]').get_attribute('value')
-        customer_note = self.driver.find_element(By.XPATH, '//*[@id="customer_remark"]').get_attribute('value')
-
-        # Shipment
-        service_shipment = self.driver.find_element(By.XPATH,
-                                                    '//*[@id="select2-shiping_service-container"]').get_attribute(
-            'title')
+        # Payment, customer and line items in a single call
+        if not check_element_exist('//input[@name="uid"]', driver=self.driver):
+            raise NoSuchElementException(msg=f"The form of order {id} is not loaded")
+        form = self.driver.execute_script(_ORDER_FORM_SCRIPT)
+        if not form['code']:
+            raise NoSuchElementException(msg=f"The form of order {id} has no order code")
+        status_payment = form['state']
+        customer_phone = form['customer_phone']
 
         order = Order(
             id=id,
-            code=code,
+            code=form['code'],
             created_on=created_on,
             status=status_payment,
-            customer_data=Customer(name=customer_name, email=customer_email, phone_number=customer_phone),
+            customer_data=Customer(name=form['customer_name'], email=form['customer_email'],
+                                   phone_number=customer_phone),
             fulfillment_status=status_payment,
             received_status=status_payment,
             payment_status=status_payment,
@@ -131,38 +233,22 @@ class AutomationWebOrder(Web):
             total_discount="",
             total_tax="",
             order_line_items=[],
-            billing_address=Address(country='Việt Nam', city=customer_province, district=customer_district,
-                                    ward=customer_ward, phone_number=customer_phone,
-                                    address1=customer_address),
-            total=total_cost
+            billing_address=Address(country='Việt Nam', city=form['customer_province'],
+                                    district=form['customer_district'], ward=form['customer_ward'],
+                                    phone_number=customer_phone, address1=form['customer_address']),
+            total=form['total']
 
         )
 
-        fulfillment = Fulfillment
+        fulfillment = Fulfillment()
         # Fulfillment line items
         fulfillment_line_items = []
-        table = self.driver.find_element(By.XPATH, '//*[@id="body_order"]/div[2]/table')
-        rows = table.find_elements(By.XPATH, "tbody/tr")  # get all of the rows in the table
-        for row in rows:
-            # Get name column item
-            col = row.find_element(By.XPATH, "td[1]")
-            item_name = col.find_element(By.XPATH, 'a').text
-
-            # Quantity
-            col = row.find_element(By.XPATH, "td[2]")
-            quantity = col.find_element(By.NAME, "quantity").get_attribute('value')
-
-            # Unit price - Đn giá
-            col = row.find_element(By.XPATH, "td[3]")
-            unit_price = col.find_element(By.CLASS_NAME, "product_price").get_attribute('value')
-
-            # Price - Thành tiền
-            col = row.find_element(By.XPATH, "td[4]")
-            price = col.find_element(By.TAG_NAME, "span").text
-
-            order.order_line_items.append(Item(product_name=item_name, quantity=quantity, price=unit_price))
+        for row in form['items']:
+            order.order_line_items.append(Item(product_name=row['name'], quantity=row['quantity'],
+                                               price=row['unit_price']))
             fulfillment_line_items.append(
-                FulfillmentItem(product_name=item_name, quantity=quantity, base_price=unit_price, line_amount=price))
+                FulfillmentItem(product_name=row['name'], quantity=row['quantity'], base_price=row['unit_price'],
+                                line_amount=row['price']))
 
         for fullfill_item in fulfillment_line_items:
             # SKU
@@ -170,42 +256,87 @@ class AutomationWebOrder(Web):
 
         for order_item in order.order_line_items:
             # Check combo
-            self.search_detail_item(order_item.product_name)
-            combo_tag = f'//table[@id="m-datatable-list"]/tbody/tr/td/span/a[contains(.,"Edit Combo")]'
-            if check_element_exist(combo_tag, By.XPATH):
-                self.driver.find_element(By.XPATH, combo_tag).click()
-                order_item.composite_item_domains = self.get_composite_item()
+            composite_items = self.get_combo_components(order_item.product_name)
+            if composite_items:
+                order_item.composite_item_domains = composite_items
 
         fulfillment.fulfillment_line_items = fulfillment_line_items
-        fulfillment.notes = customer_note
+        fulfillment.notes = form['customer_note']
         order.fulfillments = [fulfillment]
-        self.orders.append(order)
+        return order
+
+    def refresh_product_index(self):
+        # One page load per page of the product list instead of one search per product
+        skus, combos = {}, {}
+        page = 1
+        while True:
+            self.driver.get(f'{get_value_of_config("website_url")}/product/?page={page}')
+            if not check_element_exist('//table[@id="m-datatable-list"]/tbody/tr', driver=self.driver):
+                break
+            rows = [row for row in self.driver.execute_script(_PRODUCT_ROWS_SCRIPT) if row[0] and row[0] not in skus]
+            if not rows:
+                # Past the last page, or the list ignores the page parameter
+                break
+            for name, sku, is_combo in rows:
+                skus[name] = sku or None
+                if not is_combo:
+                    combos[name] = []
+            page += 1
+
+        skus = {name: sku for name, sku in skus.items() if sku}
+        if not skus and not combos:
+            self.logging.error(msg="[Product Index] Cannot read any product from the product list")
+            return
+        # Without a SKU column in the list, the SKUs resolved one by one are kept for another period
+        self.sku_index.replace(skus or dict(self.sku_index.items))
+        # Components of a combo are only read from its detail page, when an order needs them, so every combo
+        # is read again after a refresh and the deleted ones go away
+        self.combo_index.replace(combos)
+        self.logging.info(msg=f"[Product Index] Indexed {len(skus)} SKUs and {len(combos)} plain products")
 
     def get_sku_item(self, product_name):
+        sku = self.sku_index.get(product_name)
+        if sku is not None:
+            return sku
         self.search_detail_item(product_name)
         self.click_to_detail_page(product_name)
         sku_xpath = '//*[@id="sku"]'
-        attempt_check_exist_by_xpath(sku_xpath)
-        return self.driver.find_element(By.XPATH, sku_xpath).get_attribute('value')
+        attempt_check_exist_by_xpath(sku_xpath, driver=self.driver)
+        sku = self.driver.find_element(By.XPATH, sku_xpath).get_attribute('value')
+        self.sku_index.update({product_name: sku})
+        return sku
+
+    def get_combo_components(self, product_name) -> List[CompositeItem]:
+        components = self.combo_index.get(product_name)
+        if components is None:
+            self.search_detail_item(product_name)
+            combo_tag = '//table[@id="m-datatable-list"]/tbody/tr/td/span/a[contains(.,"Edit Combo")]'
+            composite_items = []
+            if check_element_exist(combo_tag, By.XPATH, driver=self.driver):
+                self.driver.find_element(By.XPATH, combo_tag).click()
+                composite_items = self.get_composite_item()
+            components = [composite_item.to_dict() for composite_item in composite_items]
+            self.combo_index.update({product_name: components})
+        return [CompositeItem.from_dict(component) for component in components]
 
     def search_detail_item(self, product_name):
         # Get detail
         self.driver.get(f'{get_value_of_config("website_url")}/product/')
         # Searching
         search_item_xpath = '//*[@id="m_form_search"]'
-        attempt_check_exist_by_xpath(search_item_xpath)
+        attempt_check_exist_by_xpath(search_item_xpath, driver=self.driver)
 
         search_input = self.driver.find_element(By.XPATH, search_item_xpath)
         search_input.send_keys(product_name)
 
         # Search item from product page
         search_button_xpath = '//*[@id="search_item"]'
-        attempt_check_can_clickable_by_xpath(search_button_xpath)
+        attempt_check_can_clickable_by_xpath(search_button_xpath, driver=self.driver)
         self.driver.find_element(By.XPATH, search_button_xpath).click()
 
     def click_to_detail_page(self, product_name):
         item_xpath = f'//table[@id="m-datatable-list"]/tbody/tr/td/span/a[contains(.,"{product_name}")]'
-        attempt_check_can_clickable_by_xpath(item_xpath)
+        attempt_check_can_clickable_by_xpath(item_xpath, driver=self.driver)
         self.driver.find_element(By.XPATH, item_xpath).click()
 
     def get_composite_item(self) -> List[CompositeItem]:
@@ -0,0 +1,115 @@
+import hashlib
+import os
+import pickle
+import time
+from typing import Optional
+
+from src.InputProduct import InputProduct, InputDetailProduct
+from src.utils import get_item_information, set_up_logger, ITEM_INFORMATION_FILE
+
+CATALOG_SNAPSHOT_FILE = 'ITEM_INFORMATION.snapshot'
+CATALOG_SNAPSHOT_VERSION = 1
+
+
+class Catalog:
+    """
+    Read-only view of ITEM_INFORMATION.xlsx indexed for constant time SKU lookups.
+    """
+
+    def __init__(self, item_information: list[InputProduct], source_hash: str = None):
+        self.item_information = item_information
+        self.source_hash = source_hash
+        self.load_seconds = 0.0
+        self.items_by_id: dict[str, InputProduct] = {}
+        self.products_by_id: dict[str, InputDetailProduct] = {}
+        self.products_by_item_and_id: dict[tuple, InputDetailProduct] = {}
+        self.compositions: dict[str, tuple[InputDetailProduct, ...]] = {}
+
+        # The first match wins, the same as the list scans used before
+        for item in item_information:
+            self.items_by_id.setdefault(item.Item_Id, item)
+            self.compositions.setdefault(item.Item_Id, tuple(item.Product))
+            for product in item.Product:
+                self.products_by_id.setdefault(product.Product_Id, product)
+                self.products_by_item_and_id.setdefault((item.Item_Id, product.Product_Id), product)
+
+    @classmethod
+    def load(cls, path: str = ITEM_INFORMATION_FILE, snapshot_path: str = CATALOG_SNAPSHOT_FILE) -> 'Catalog':
+        logging = set_up_logger("Middleware_Tool")
+        start = time.perf_counter()
+        stat = os.stat(path)
+        snapshot = _read_snapshot(snapshot_path)
+
+        # Same size and modified time: trust the snapshot without hashing the workbook
+        if snapshot is not None and snapshot['source_mtime'] == stat.st_mtime_ns \
+                and snapshot['source_size'] == stat.st_size:
+            return cls._log_loaded(cls(snapshot['item_information'], snapshot['source_hash']), 'snapshot', start)
+
+        source_hash = _hash_file(path)
+        if snapshot is not None and snapshot['source_hash'] == source_hash:
+            item_information = snapshot['item_information']
+        else:
+            logging.info(msg=f"[Catalog] {path} changed, rebuilding snapshot {snapshot_path}")
+            item_information = get_item_information(path)
+
+        try:
+            _write_snapshot(snapshot_path, {
+                'version': CATALOG_SNAPSHOT_VERSION,
+                'source_hash': source_hash,
+                'source_mtime': stat.st_mtime_ns,
+                'source_size': stat.st_size,
+                'item_information': item_information,
+            })
+        except OSError as e:
+            logging.error(msg=f"[Catalog] Cannot write snapshot {snapshot_path}: {e}")
+        return cls._log_loaded(cls(item_information, source_hash), path, start)
+
+    @staticmethod
+    def _log_loaded(catalog: 'Catalog', source: str, start: float) -> 'Catalog':
+        catalog.load_seconds = time.perf_counter() - start
+        set_up_logger("Middleware_Tool").info(
+            msg=f"[Catalog] Loaded {len(catalog.items_by_id)} items, {len(catalog.products_by_id)} products "
+                f"from {source} in {catalog.load_seconds:.3f}s")
+        return catalog
+
+    def has_item(self, item_id) -> bool:
+        return item_id in self.items_by_id
+
+    def find_item(self, item_id) -> Optional[InputProduct]:
+        return self.items_by_id.get(item_id)
+
+    def find_product(self, product_id) -> Optional[InputDetailProduct]:
+        return self.products_by_id.get(product_id)
+
+    def find_sub_product(self, item_id, product_id) -> Optional[InputDetailProduct]:
+        return self.products_by_item_and_id.get((item_id, product_id))
+
+    def get_composition(self, item_id) -> tuple[InputDetailProduct, ...]:
+        return self.compositions.get(item_id, ())
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_snapshot(snapshot_path: str) -> Optional[dict]:
+    try:
+        with open(snapshot_path, 'rb') as f:
+            snapshot = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get('version') != CATALOG_SNAPSHOT_VERSION:
+        return None
+    return snapshot
+
+
+def _write_snapshot(snapshot_path: str, snapshot: dict):
+    # Write beside the target and rename so a crash never leaves a half written snapshot
+    temp_path = f"{snapshot_path}.tmp"
+    with open(temp_path, 'wb') as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, snapshot_path)
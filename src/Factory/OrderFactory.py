@@ -2,14 +2,20 @@ from abc import ABC, abstractmethod
 from typing import List
 
 from src.APIWebOrder import APIWebOrder
+from src.AsyncAPIWebOrder import AsyncAPIWebOrder
 from src.AutomationMisaOrder import AutomationMisaOrder
 from src.AutomationSapoOrder import AutomationSapoOrder
 from src.AutomationWebOrder import AutomationWebOrder
 from src.Enums import SapoShop, Category, Channel
 from src.MISA_Implementation.AutomationMisaOrderFromSAPO import AutomationMisaOrderFromSAPO
 from src.MISA_Implementation.AutomationMisaOrderFromWEB import AutomationMisaOrderFromWEB
+from src.MisaImportExporter import MisaImportExporter
+from src.MisaSubmissionPool import MisaSubmissionPool
 from src.Model.Order import Order
+from src.MultiChannelOrder import MultiChannelOrder
 from src.OrderRequest import OrderRequest
+from src.Singleton.AppConfig import AppConfig
+from src.utils import get_value_of_config_or_default
 
 
 class OrderFactory(ABC):
@@ -22,14 +28,34 @@ class OrderFactory(ABC):
     def create_sapo_order(self, order: OrderRequest, shop: SapoShop):
         pass
 
+    @staticmethod
+    def create_all_channel_order(order: OrderRequest):
+        return MultiChannelOrder(order)
+
     def submit_order(self, orders: List[Order], state_channel: Channel):
         if state_channel == Channel.SAPO:
-            auto_misa = AutomationMisaOrderFromSAPO(orders=orders)
+            automation_class = AutomationMisaOrderFromSAPO
         elif state_channel == Channel.WEB:
-            auto_misa = AutomationMisaOrderFromWEB(orders=orders)
+            automation_class = AutomationMisaOrderFromWEB
         else:
             raise ValueError("Invalid method")
-        auto_misa.send_orders_to_misa()
+        try:
+            # misa_submission_mode: ui (default) keys the orders in MISA, import writes MISA import files
+            if get_value_of_config_or_default('misa_submission_mode', 'ui') == 'import':
+                MisaImportExporter(orders, state_channel).export()
+                return
+            # Every worker of the pool keys orders in its own MISA session (misa_worker_pool_size)
+            MisaSubmissionPool(automation_class, orders).run()
+        finally:
+            # Close the shared browser as the single session flow did, e.g. the one left by a web search
+            AppConfig.destroy_instance()
+
+    def submit_orders_by_channel(self, orders: List[Order], default_channel: Channel):
+        # Orders of a multi-channel search go to the MISA flow of the channel they came from
+        for channel in Channel:
+            channel_orders = [order for order in orders if (order.origin_channel or default_channel) == channel]
+            if channel_orders:
+                self.submit_order(channel_orders, channel)
 
     @staticmethod
     def set_category_request(request: Category):
@@ -50,6 +76,9 @@ class OrderAutoFactory(OrderFactory):
 
 class OrderAPIFactory(OrderFactory):
     def create_web_order(self, order: OrderRequest):
+        # web_api_client: sync (default) or async
+        if get_value_of_config_or_default('web_api_client', 'sync') == 'async':
+            return AsyncAPIWebOrder(order)
         return APIWebOrder(order)
 
     def create_sapo_order(self, shop: SapoShop):
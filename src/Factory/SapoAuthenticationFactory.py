@@ -0,0 +1,18 @@
+from src.Authentication.FormSapoAuthentication import FormSapoAuthentication
+from src.Authentication.PrivateAppSapoAuthentication import PrivateAppSapoAuthentication
+from src.Authentication.SeleniumSapoAuthentication import SeleniumSapoAuthentication
+from src.HttpTransport import HttpTransport
+from src.Interface.ISapoAuthentication import ISapoAuthentication
+from src.utils import get_value_of_config_or_default
+
+
+def create_sapo_authentication(domain: str, transport: HttpTransport) -> ISapoAuthentication:
+    # sapo_auth: selenium (default), form or private_app
+    method = get_value_of_config_or_default('sapo_auth', 'selenium')
+    if method == 'form':
+        return FormSapoAuthentication(domain, transport)
+    elif method == 'private_app':
+        return PrivateAppSapoAuthentication(domain, transport)
+    elif method == 'selenium':
+        return SeleniumSapoAuthentication(domain)
+    raise ValueError(f"Invalid Sapo authentication method {method}")
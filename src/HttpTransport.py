@@ -0,0 +1,107 @@
+import threading
+from typing import Callable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.utils import set_up_logger
+
+
+class HttpTransport:
+    """
+    Keep-alive HTTP session for one upstream (a Sapo shop, the web API...).
+
+    Cookies come from ``cookie_provider`` (a WebDriver session, a login call...) the first time a
+    request is sent and are refreshed only when the upstream answers 401. Every request gets connect
+    and read timeouts, and failed GET / HEAD requests are retried with exponential backoff. A POST is
+    never retried, it may have been applied upstream. ``pool_size`` is the number of connections kept
+    to the upstream, the most requests the callers send to it at the same time.
+    """
+    DEFAULT_TIMEOUT = (10, 60)
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+
+    def __init__(self, name: str, cookie_provider: Callable[[], dict] = None, timeout=DEFAULT_TIMEOUT,
+                 retries: int = 3, backoff_factor: float = 0.5, pool_size: int = 10):
+        self.name = name
+        self.logging = set_up_logger("Middleware_Tool")
+        self.timeout = timeout
+        self.cookie_provider = cookie_provider
+        self._cookies_loaded = False
+        self._cookies_generation = 0
+        self._lock = threading.Lock()
+
+        retry = Retry(total=retries, connect=retries, read=retries, status=retries,
+                      backoff_factor=backoff_factor, status_forcelist=self.RETRY_STATUS,
+                      allowed_methods=frozenset({'GET', 'HEAD'}), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def set_cookie_provider(self, cookie_provider: Callable[[], dict]):
+        self.cookie_provider = cookie_provider
+
+    def has_cookies(self) -> bool:
+        return self._cookies_loaded
+
+    def use_cookies(self, cookies: dict):
+        # Cookies obtained elsewhere (a stored session...), the provider is kept for the next 401
+        with self._lock:
+            self.session.cookies.clear()
+            self.session.cookies.update(cookies)
+            self._cookies_loaded = True
+            self._cookies_generation += 1
+
+    def refresh_cookies(self, seen_generation: int = None):
+        with self._lock:
+            # Concurrent 401s only trigger one refresh
+            if seen_generation is None or seen_generation == self._cookies_generation:
+                self._load_cookies()
+
+    def get(self, url, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def request(self, method: str, url: str, authenticate: bool = True, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self.timeout)
+        if authenticate and not self._cookies_loaded and self.cookie_provider is not None:
+            with self._lock:
+                if not self._cookies_loaded:
+                    self._load_cookies()
+
+        generation = self._cookies_generation
+        response = self.session.request(method, url, **kwargs)
+        if authenticate and response.status_code == 401 and self.cookie_provider is not None:
+            self.logging.info(msg=f"[Transport] {self.name} answered 401, refreshing cookies")
+            self.refresh_cookies(generation)
+            response = self.session.request(method, url, **kwargs)
+        return response
+
+    def _load_cookies(self):
+        cookies = self.cookie_provider()
+        self.session.cookies.clear()
+        self.session.cookies.update(cookies)
+        self._cookies_loaded = True
+        self._cookies_generation += 1
+
+
+_transports: dict[str, HttpTransport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(name: str, cookie_provider: Optional[Callable[[], dict]] = None,
+                  pool_size: int = 10) -> HttpTransport:
+    """
+    Return the process-wide transport of an upstream, creating it on first use with ``pool_size`` connections.
+    """
+    with _transports_lock:
+        transport = _transports.get(name)
+        if transport is None:
+            transport = HttpTransport(name, cookie_provider, pool_size=pool_size)
+            _transports[name] = transport
+        elif cookie_provider is not None:
+            transport.set_cookie_provider(cookie_provider)
+        return transport
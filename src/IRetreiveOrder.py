@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Iterator
 
 from src.Model.Order import Order
 
@@ -20,6 +20,18 @@ class Web(ABC):
         # Return orders from search and between from and to date
         pass
 
+    def iter_orders_by_search(self) -> Iterator[Order]:
+        # Yield enriched orders from search as soon as their page is ready
+        yield from self.get_orders_by_search()
+
+    def iter_orders_by_date(self) -> Iterator[Order]:
+        # Yield enriched orders from date and to date as soon as their page is ready
+        yield from self.get_orders_by_date()
+
+    def iter_orders_by_search_and_date(self) -> Iterator[Order]:
+        # Yield enriched orders from search and between from and to date as soon as their page is ready
+        yield from self.get_orders_by_search_and_date()
+
 
 class SAPO(ABC):
     @abstractmethod
@@ -36,3 +48,15 @@ class SAPO(ABC):
     def get_orders_by_search_and_date(self) -> List[Order]:
         # Return orders from search and between from and to date
         pass
+
+    def iter_orders_by_search(self) -> Iterator[Order]:
+        # Yield enriched orders from search as soon as their page is ready
+        yield from self.get_orders_by_search()
+
+    def iter_orders_by_date(self) -> Iterator[Order]:
+        # Yield enriched orders from date and to date as soon as their page is ready
+        yield from self.get_orders_by_date()
+
+    def iter_orders_by_search_and_date(self) -> Iterator[Order]:
+        # Yield enriched orders from search and between from and to date as soon as their page is ready
+        yield from self.get_orders_by_search_and_date()
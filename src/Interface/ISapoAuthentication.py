@@ -0,0 +1,11 @@
+from abc import ABC, abstractmethod
+
+
+class ISapoAuthentication(ABC):
+    # Whether the credentials returned by login() may be stored and reused by later runs
+    is_persistent = True
+
+    @abstractmethod
+    def login(self) -> dict:
+        # Authenticate against the shop and return the cookies of the session, as a dict or a cookie jar
+        pass
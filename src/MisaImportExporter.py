@@ -0,0 +1,97 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from src.Enums import Channel
+from src.MisaInvoiceRules import MARKETPLACE_SOURCES, get_order_date, get_sale_customer_name, \
+    get_warehouse_customer_name, get_invoice_lines, is_promotion, get_marketplace_discount, get_order_discount_line, \
+    get_appendix_notes, get_warehouse_quantities
+from src.Model.Order import Order
+from src.utils import set_up_logger, get_value_of_config, get_value_of_config_or_default
+
+SALE_INVOICE_COLUMNS = ['Ngày hạch toán', 'Ngày chứng từ', 'Số chứng từ', 'Số đơn hàng từ hệ thống khác',
+                        'Tên khách hàng', 'Mã hàng', 'Diễn giải', 'Là dòng ghi chú', 'Hàng khuyến mại',
+                        'Chiết khấu thương mại', 'Số lượng', 'Thành tiền', 'Tỷ lệ CK (%)', 'Tiền chiết khấu']
+STOCK_OUT_COLUMNS = ['Ngày hạch toán', 'Ngày chứng từ', 'Số chứng từ', 'Tên khách hàng', 'Mã hàng', 'Kho',
+                     'Số lượng']
+
+
+class MisaImportExporter:
+    """
+    Writes a batch of orders as MISA import files instead of keying them in the MISA grid.
+
+    One workbook holds the sale invoices and one the stock-out vouchers, one row per grid line and the
+    order code as voucher number, built with the same rules as the UI automation (``MisaInvoiceRules``).
+    MISA fills the unit price from its catalog on import, so the marketplace line discount is spread on
+    the catalog price of the order instead of MISA's "Thành tiền", and the invoice total is not balanced
+    against MISA's total as the automation does.
+    """
+
+    def __init__(self, orders: list[Order], channel: Channel):
+        self.logging = set_up_logger("Middleware_Tool")
+        self.orders = orders
+        self.channel = channel
+        self.directory = get_value_of_config_or_default('misa_import_directory', 'misa_import')
+        self.skipped_orders = []
+
+    def export(self) -> list[str]:
+        # Returns the paths of the sale invoice and stock-out voucher workbooks
+        sale_rows, stock_out_rows = [], []
+        for order in self.orders:
+            try:
+                order_sale_rows = self.get_sale_invoice_rows(order)
+                order_stock_out_rows = self.get_stock_out_rows(order)
+            except Exception as e:
+                self.logging.error(msg=f"[Misa Import] Skip order {order.code}: {e}")
+                self.skipped_orders.append(order.code)
+                continue
+            sale_rows.extend(order_sale_rows)
+            stock_out_rows.extend(order_stock_out_rows)
+
+        os.makedirs(self.directory, exist_ok=True)
+        suffix = f"{self.channel.name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        sale_path = os.path.join(self.directory, f"MISA_hoa_don_ban_hang_{suffix}.xlsx")
+        stock_out_path = os.path.join(self.directory, f"MISA_phieu_xuat_kho_{suffix}.xlsx")
+        pd.DataFrame(sale_rows, columns=SALE_INVOICE_COLUMNS).to_excel(sale_path, index=False, engine='openpyxl')
+        pd.DataFrame(stock_out_rows, columns=STOCK_OUT_COLUMNS).to_excel(stock_out_path, index=False,
+                                                                         engine='openpyxl')
+        self.logging.info(
+            msg=f"[Misa Import] Exported {len(self.orders) - len(self.skipped_orders)} orders to {sale_path} "
+                f"and {stock_out_path}. Skipped orders: {','.join(self.skipped_orders)}")
+        return [sale_path, stock_out_path]
+
+    def _get_voucher_columns(self, order: Order, customer_name: str) -> dict:
+        date = get_order_date(order, self.channel).strftime('%d/%m/%Y')
+        return {'Ngày hạch toán': date, 'Ngày chứng từ': date, 'Số chứng từ': order.code,
+                'Tên khách hàng': customer_name}
+
+    def get_sale_invoice_rows(self, order: Order) -> list[dict]:
+        voucher = self._get_voucher_columns(order, get_sale_customer_name(order, self.channel))
+        if self.channel == Channel.SAPO:
+            voucher['Số đơn hàng từ hệ thống khác'] = order.code
+
+        rows = []
+        for line in get_invoice_lines(order, self.channel):
+            row = {**voucher, 'Mã hàng': line.sku, 'Số lượng': line.quantity, 'Tỷ lệ CK (%)': line.discount_rate,
+                   'Hàng khuyến mại': is_promotion(line)}
+            if line.source_name in MARKETPLACE_SOURCES:
+                row['Tiền chiết khấu'] = get_marketplace_discount(line, line.unit_price * line.quantity)
+            rows.append(row)
+
+        # Commercial discount of the whole order, without VAT
+        discount_line = get_order_discount_line(order) if self.channel == Channel.SAPO else None
+        if discount_line is not None:
+            # Rounded to the unit as the UI automation keys it
+            rows.append({**voucher, 'Mã hàng': discount_line.sku, 'Chiết khấu thương mại': True,
+                         'Số lượng': discount_line.quantity, 'Thành tiền': round(discount_line.line_amount)})
+
+        for note in get_appendix_notes(order, self.channel):
+            rows.append({**voucher, 'Diễn giải': note, 'Là dòng ghi chú': True})
+        return rows
+
+    def get_stock_out_rows(self, order: Order) -> list[dict]:
+        voucher = self._get_voucher_columns(order, get_warehouse_customer_name(order, self.channel))
+        warehouse_id = get_value_of_config("warehouse_id")
+        return [{**voucher, 'Mã hàng': sku, 'Kho': warehouse_id, 'Số lượng': quantity}
+                for sku, quantity in get_warehouse_quantities(order.order_line_items, self.channel).items()]
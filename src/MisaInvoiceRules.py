@@ -0,0 +1,124 @@
+from datetime import datetime
+from typing import Optional
+
+import pandas as pd
+
+from src.Enums import Channel
+from src.Model.Item import Item
+from src.Model.MisaRequestTable import MisaRequestTable
+from src.Model.Order import Order
+from src.utils import get_value_of_config, string_to_float, parse_time_format_webAPI
+
+# What an order becomes in MISA, shared by the UI automation and the import file exporter
+
+# Marketplaces whose line discount is keyed as a value on top of the rate
+MARKETPLACE_SOURCES = ('Lazada', 'Tiki', 'TiktokShop')
+VAT_RATE = 1.1
+
+
+def get_order_date(order: Order, channel: Channel) -> datetime:
+    if channel == Channel.WEB:
+        return parse_time_format_webAPI(order.created_on)
+    return datetime.strptime(order.created_on, '%Y-%m-%dT%H:%M:%SZ')
+
+
+def get_sale_customer_name(order: Order, channel: Channel) -> str:
+    source = "Website: giangs.vn" if channel == Channel.WEB else order.source_name
+    return f"{get_value_of_config('environment')}Khách hàng lẻ không lấy hóa đơn (Bán hàng qua {source})"
+
+
+def get_warehouse_customer_name(order: Order, channel: Channel) -> str:
+    source = "Website: giangs.vn" if channel == Channel.WEB else order.source_name
+    return f"{get_value_of_config('environment')} Mã đơn hàng: {order.code}(Bán hàng qua {source})"
+
+
+def get_invoice_lines(order: Order, channel: Channel) -> list[MisaRequestTable]:
+    # One line per product of the sale invoice grid, a combo is split into its components
+    lines = []
+    for item in order.order_line_items:
+        if channel == Channel.WEB:
+            for it in item.composite_item_domains:
+                lines.append(MisaRequestTable(sku=it.sku, quantity=it.quantity, discount_rate=it.discount,
+                                              current_row=len(lines) + 1))
+        elif item.is_composite:
+            for it in item.composite_item_domains:
+                lines.append(MisaRequestTable(
+                    sku=it.sku,
+                    quantity=it.quantity,
+                    discount_rate=item.discount_rate,
+                    current_row=len(lines) + 1,
+                    source_name=order.source_name,
+                    price=item.price,
+                    line_amount=string_to_float(item.price),
+                    default_item_quantity=item.quantity,
+                    discount_value=string_to_float(item.discount_value),
+                    unit_price=string_to_float(it.price)))
+        else:
+            lines.append(MisaRequestTable(
+                sku=item.sku,
+                quantity=item.quantity,
+                discount_rate=item.discount_rate,
+                current_row=len(lines) + 1,
+                source_name=order.source_name,
+                price=item.price,
+                line_amount=string_to_float(item.price),  # Not in case composite will not separate
+                default_item_quantity=item.quantity,
+                discount_value=string_to_float(item.discount_value),
+                unit_price=string_to_float(item.price)))
+    return lines
+
+
+def is_promotion(line: MisaRequestTable) -> bool:
+    return line.discount_rate == "100.0" or line.price == '0'
+
+
+def get_marketplace_discount(line: MisaRequestTable, total_money: float) -> int:
+    # Discount of the order line spread on the amount of this product line (Thành tiền)
+    if not line.discount_value or not line.line_amount:
+        return 0
+    return round(total_money / line.line_amount * line.discount_value)
+
+
+def has_order_discount(order: Order) -> bool:
+    return sum(float(item.distributed_discount_amount) for item in order.order_line_items) > 0
+
+
+def get_order_discount_amount(order: Order) -> float:
+    # Keyed without VAT on the discount_item_sku line
+    return float(order.order_discount_amount) / VAT_RATE
+
+
+def get_order_discount_line(order: Order) -> Optional[MisaRequestTable]:
+    # Commercial discount of the whole order, one more line after the products with a zero quantity
+    if not has_order_discount(order):
+        return None
+    return MisaRequestTable(sku=get_value_of_config('discount_item_sku'), quantity=0,
+                            current_row=len(get_invoice_lines(order, Channel.SAPO)) + 1,
+                            line_amount=get_order_discount_amount(order))
+
+
+def get_appendix_notes(order: Order, channel: Channel) -> list[str]:
+    if channel == Channel.WEB:
+        created_date = get_order_date(order, channel)
+        return [f"Bổ sung đơn hàng ngày "
+                f"{created_date.day}/{created_date.month}/{created_date.year} "
+                f"(Mã đơn hàng: {order.code})"]
+    notes = []
+    if sum(float(item.discount_amount) for item in order.order_line_items) > 0:
+        notes.append("Chiết khấu cho khách hàng đặc biệt.")
+    notes.append(f"Mã đơn hàng: {order.code}")
+    return notes
+
+
+def get_warehouse_quantities(line_items: list[Item], channel: Channel) -> dict:
+    # Quantity per SKU of the stock-out voucher, a combo is split into its components
+    data = []
+    for item in line_items:
+        if item.is_composite or channel == Channel.WEB:
+            for it in item.composite_item_domains:
+                data.append((it.sku, it.quantity))
+        else:
+            data.append((item.sku, item.quantity))
+
+    df = pd.DataFrame(data, columns=['sku', 'quantity'])
+    return df.groupby('sku')['quantity'].sum().to_dict()
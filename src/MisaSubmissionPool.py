@@ -0,0 +1,108 @@
+import queue
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from src.AutomationMisaOrder import AutomationMisaOrder
+from src.Model.Order import Order
+from src.Singleton.AppConfig import AppConfig
+from src.utils import set_up_logger, get_value_of_config_or_default
+
+
+class MisaSubmissionPool:
+    """
+    Submits orders to MISA from several browsers at once.
+
+    Each of the ``misa_worker_pool_size`` workers opens its own Chrome and logs in to MISA. Then it takes
+    orders from a shared queue and keys the sale invoice and the warehouse voucher of one order at a time.
+    A failed order goes back to the queue, so another session usually retries it, until it has been
+    tried ``misa_max_attempts`` times. A worker whose session breaks starts a new one, up to
+    ``misa_worker_restarts`` times, and the orders left once every worker gave up are not handled.
+    The pool size is the number of sessions the MISA account tolerates at the same time. 1 keeps the
+    single browser flow.
+    """
+
+    def __init__(self, automation_class: type[AutomationMisaOrder], orders: list[Order]):
+        self.logging = set_up_logger("Middleware_Tool")
+        self.automation_class = automation_class
+        self.orders = orders
+        self.pool_size = max(1, min(int(get_value_of_config_or_default('misa_worker_pool_size', 1)), len(orders)))
+        self.max_attempts = int(get_value_of_config_or_default('misa_max_attempts', 10))
+        self.max_restarts = int(get_value_of_config_or_default('misa_worker_restarts', 2))
+        self.handle_orders = []
+        # Orders given up after max_attempts
+        self.missing_orders = []
+        self._attempts = defaultdict(int)
+        self._pending = queue.Queue()
+        self._results_lock = threading.Lock()
+        self._login_lock = threading.Lock()
+
+    def run(self) -> list[Order]:
+        # Returns the orders that could not be submitted
+        if not self.orders:
+            return []
+        for order in self.orders:
+            self._pending.put(order)
+        with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+            for worker in range(1, self.pool_size + 1):
+                executor.submit(self._work, worker)
+
+        # Every worker gave up: the orders still queued are not handled
+        while True:
+            try:
+                self.missing_orders.append(self._pending.get_nowait().code)
+            except queue.Empty:
+                break
+
+        not_handled_orders = [o for o in self.orders if o.code not in self.handle_orders]
+        self.logging.info(msg=f"[Misa] Not handle orders: {','.join(o.code for o in not_handled_orders)}")
+        return not_handled_orders
+
+    def _work(self, worker: int):
+        for restart in range(self.max_restarts + 1):
+            if restart:
+                self.logging.info(msg=f"[Misa] Worker {worker} starts a new session ({restart}/{self.max_restarts})")
+            if self._run_session(worker) or self._pending.empty():
+                return
+        self.logging.critical(msg=f"[Misa] Worker {worker} gave up after {self.max_restarts + 1} broken sessions")
+
+    def _run_session(self, worker: int) -> bool:
+        # True once the queue is empty, False when the session broke
+        driver = None
+        try:
+            driver = AppConfig.create_chrome_driver()
+            automation = self.automation_class(driver=driver)
+            # Log in the sessions of the same account one after the other
+            with self._login_lock:
+                automation.open_session()
+            self.logging.info(msg=f"[Misa] Worker {worker} logged in")
+
+            while True:
+                try:
+                    order = self._pending.get_nowait()
+                except queue.Empty:
+                    return True
+                is_handled = False
+                try:
+                    is_handled = automation.submit_order(order)
+                finally:
+                    # Reported even if the session broke, so the order is retried
+                    self._report(order, is_handled)
+        except Exception as e:
+            self.logging.critical(msg=f"[Misa] Worker {worker} session broke with error: {e}")
+            return False
+        finally:
+            if driver is not None:
+                driver.quit()
+
+    def _report(self, order: Order, is_handled: bool):
+        with self._results_lock:
+            self._attempts[order.code] += 1
+            if is_handled:
+                self.handle_orders.append(order.code)
+                return
+            if self._attempts[order.code] < self.max_attempts:
+                self.logging.info(msg=f"[Misa] Retry order {order.code} at attempt {self._attempts[order.code] + 1}")
+                self._pending.put(order)
+            else:
+                self.missing_orders.append(order.code)
@@ -12,3 +12,4 @@ class MisaRequestTable:
     price: str = None
     line_amount: float = 0.0
     default_item_quantity: int = None
+    unit_price: float = 0.0
@@ -3,6 +3,7 @@ from typing import Optional, List
 
 from dataclasses_json import dataclass_json
 
+from src.Enums import Channel
 from src.Model.Customer.Address import Address
 from src.Model.Customer.Customer import Customer
 from src.Model.DiscountItem import DiscountItem
@@ -80,4 +81,7 @@ class Order:
     source_id: int = 0
     source_name: str = None
     sent_to_misa: bool = False
+    # Fetcher the order came from (sapo:<shop domain> or web), set locally
+    origin: str = None
+    origin_channel: Channel = None
 
@@ -0,0 +1,98 @@
+import copy
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Iterator
+
+from src.APIWebOrder import APIWebOrder
+from src.AutomationSapoOrder import AutomationSapoOrder
+from src.Enums import SapoShop
+from src.Model.Order import Order
+from src.OrderRequest import OrderRequest
+from src.utils import set_up_logger
+
+
+class MultiChannelOrder:
+    """
+    Runs the same search on every configured Sapo shop and on the web channel at once.
+
+    Each channel keeps its own session and runs in its own thread. Orders are yielded as soon as any
+    channel has them and are tagged with ``origin`` / ``origin_channel``, so a run lasts as long as the
+    slowest channel instead of the sum of all of them.
+    """
+
+    def __init__(self, order: OrderRequest):
+        self.logging = set_up_logger("Middleware_Tool")
+        self.fetchers = self.create_fetchers(order)
+
+    def create_fetchers(self, order: OrderRequest):
+        fetchers = []
+        for shop in SapoShop:
+            try:
+                fetchers.append(AutomationSapoOrder(self.copy_request(order), shop))
+            except KeyError as e:
+                self.logging.info(msg=f"[All channels] Skip {shop.name}, it is not configured: {e}")
+        try:
+            fetchers.append(APIWebOrder(self.copy_request(order)))
+        except KeyError as e:
+            self.logging.info(msg=f"[All channels] Skip the web channel, it is not configured: {e}")
+        return fetchers
+
+    @staticmethod
+    def copy_request(order: OrderRequest) -> OrderRequest:
+        # Every fetcher runs in its own thread and may change its request, e.g. the codes left to search
+        request = copy.copy(order)
+        request.orders = list(order.orders)
+        return request
+
+    def get_orders_by_search(self) -> List[Order]:
+        return list(self.iter_orders_by_search())
+
+    def get_orders_by_date(self) -> List[Order]:
+        return list(self.iter_orders_by_date())
+
+    def get_orders_by_search_and_date(self) -> List[Order]:
+        return list(self.iter_orders_by_search_and_date())
+
+    def iter_orders_by_search(self) -> Iterator[Order]:
+        yield from self._iter_merged(lambda fetcher: fetcher.iter_orders_by_search())
+
+    def iter_orders_by_date(self) -> Iterator[Order]:
+        yield from self._iter_merged(lambda fetcher: fetcher.iter_orders_by_date())
+
+    def iter_orders_by_search_and_date(self) -> Iterator[Order]:
+        yield from self._iter_merged(lambda fetcher: fetcher.iter_orders_by_search_and_date())
+
+    def _iter_merged(self, iter_orders) -> Iterator[Order]:
+        results = queue.Queue()
+        stop = threading.Event()
+        finished = object()
+
+        def drain(fetcher):
+            try:
+                for order in iter_orders(fetcher):
+                    if stop.is_set():
+                        break
+                    results.put(order)
+            except Exception as e:
+                # One channel failing must not lose the orders of the others
+                self.logging.critical(msg=f"[All channels] {type(fetcher).__name__} got error: {e}")
+            finally:
+                results.put(finished)
+
+        executor = ThreadPoolExecutor(max_workers=max(len(self.fetchers), 1))
+        for fetcher in self.fetchers:
+            executor.submit(drain, fetcher)
+        try:
+            running = len(self.fetchers)
+            while running:
+                order = results.get()
+                if order is finished:
+                    running -= 1
+                else:
+                    yield order
+        finally:
+            # Closed early by the caller: the channels still running stop at their next order, without
+            # the caller waiting for them
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
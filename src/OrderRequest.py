@@ -8,3 +8,4 @@ class OrderRequest:
     status: OrderStatus
     from_date: str = None
     to_date: str = None
+    incremental: bool = False
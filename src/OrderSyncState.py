@@ -0,0 +1,87 @@
+import time
+from typing import Callable, List, Optional
+
+from src.Singleton.OrderStore import OrderStore
+
+
+class OrderSyncState:
+    """
+    High-watermark and order set of one incremental sync (one shop and order status), kept in the order store.
+
+    ``covered_from`` / ``covered_to`` is the created window the stored orders are complete for as of
+    ``watermark``, the latest change seen, and ``synced_until`` is when that sync ran. Times are compared
+    as strings, so every value of one state must use the same sortable format (ISO 8601).
+    """
+
+    def __init__(self, name: str, channel: str, created_key: Callable[[dict], str]):
+        self.name = name
+        self.channel = channel
+        self.created_key = created_key
+        self.order_store = OrderStore()
+        state = self.order_store.get_sync_state(name) or {}
+        self.watermark: Optional[str] = state.get('watermark')
+        self.covered_from: Optional[str] = state.get('covered_from')
+        self.covered_to: Optional[str] = state.get('covered_to')
+        self.filter_key: Optional[str] = state.get('filter_key')
+        self.synced_until: Optional[str] = state.get('synced_until')
+        self.synced_at: float = state.get('synced_at') or 0.0
+        self.kept_orders = {}
+        self.removed_ids = set()
+        self.is_reset = False
+        self.changed_count = 0
+
+    def can_resume(self, from_date: str, filter_key: str) -> bool:
+        # Later changes are only complete for the stored window if it reached the watermark
+        return (self.watermark is not None and self.filter_key == filter_key
+                and self.covered_from <= from_date and self.covered_to >= self.watermark)
+
+    def is_fresh(self, from_date: str, to_date: str, filter_key: str, max_age: float) -> bool:
+        # The window was already over and complete at a sync less than max_age seconds ago: re-open it locally
+        return (self.can_resume(from_date, filter_key) and self.covered_to >= to_date
+                and self.synced_until is not None and to_date < self.synced_until
+                and time.time() - self.synced_at <= max_age)
+
+    def reset(self, from_date: str, to_date: str, filter_key: str):
+        self.kept_orders = {}
+        self.removed_ids = set()
+        self.is_reset = True
+        self.watermark = None
+        self.covered_from = from_date
+        self.covered_to = to_date
+        self.filter_key = filter_key
+
+    def merge(self, order_json: dict, is_kept: bool, changed_on: Optional[str]):
+        order_id = str(order_json['id'])
+        if is_kept:
+            self.kept_orders[order_id] = order_json
+            self.removed_ids.discard(order_id)
+        else:
+            # The order left the filter (returned, cancelled...) since the last sync
+            self.kept_orders.pop(order_id, None)
+            self.removed_ids.add(order_id)
+        self.changed_count += 1
+        if changed_on is not None and (self.watermark is None or changed_on > self.watermark):
+            self.watermark = changed_on
+
+    def extend_to(self, to_date: str):
+        if self.covered_to is None or to_date > self.covered_to:
+            self.covered_to = to_date
+
+    def get_orders_between(self, from_date: str, to_date: str) -> List[dict]:
+        return self.order_store.get_sync_orders(self.name, from_date, to_date)
+
+    def save(self, synced_until: str):
+        self.synced_until = synced_until
+        self.synced_at = time.time()
+        self.order_store.save_sync(self.name, self.channel,
+                                   {'watermark': self.watermark,
+                                    'covered_from': self.covered_from,
+                                    'covered_to': self.covered_to,
+                                    'filter_key': self.filter_key,
+                                    'synced_until': self.synced_until,
+                                    'synced_at': self.synced_at},
+                                   [(self.created_key(order), order) for order in self.kept_orders.values()],
+                                   self.removed_ids, self.is_reset)
+        self.kept_orders = {}
+        self.removed_ids = set()
+        self.is_reset = False
@@ -0,0 +1,40 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, TypeVar
+
+T = TypeVar('T')
+
+
+def iter_pages_concurrently(fetch_page: Callable[[int], list[T]], first_page: list[T], total_pages: int,
+                            workers: int) -> Iterator[list[T]]:
+    """
+    Yield ``first_page`` then pages 2..total_pages in order, fetching up to ``workers`` pages ahead.
+
+    Pagination stops at the first empty page, so an over-estimated ``total_pages`` costs at most
+    ``workers`` wasted requests. Only the pages in flight are held in memory.
+    """
+    yield first_page
+    if not first_page or total_pages <= 1:
+        return
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        pending = deque()
+        next_page = 2
+
+        def submit_next():
+            nonlocal next_page
+            if next_page <= total_pages:
+                pending.append(executor.submit(fetch_page, next_page))
+                next_page += 1
+
+        for _ in range(max(1, workers)):
+            submit_next()
+
+        while pending:
+            items = pending.popleft().result()
+            if not items:
+                for future in pending:
+                    future.cancel()
+                return
+            submit_next()
+            yield items
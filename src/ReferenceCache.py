@@ -0,0 +1,89 @@
+import json
+import os
+import re
+import threading
+import time
+from typing import Optional
+
+from src.utils import set_up_logger
+
+CACHE_DIRECTORY = 'cache'
+
+
+class ReferenceCache:
+    """
+    Small id -> record dictionary persisted as JSON under ``cache/`` and shared across runs.
+
+    ``ttl`` is the number of seconds after which ``is_expired()`` asks the caller to download the
+    whole reference list again; ``None`` keeps the records until they are replaced. ``replace()`` writes
+    the file at once, ``update()`` only changes the records in memory until ``flush()`` (or the end of a
+    ``with`` block) writes them, so a run of lookups rewrites the file once.
+    """
+
+    def __init__(self, name: str, ttl: Optional[float] = None):
+        self.name = name
+        self.ttl = ttl
+        self.path = os.path.join(CACHE_DIRECTORY, f"{re.sub(r'[^A-Za-z0-9_.-]', '_', name)}.json")
+        self.logging = set_up_logger("Middleware_Tool")
+        self._lock = threading.Lock()
+        self._is_dirty = False
+        self.fetched_at, self.items = self._read()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def is_expired(self) -> bool:
+        if not self.items:
+            return True
+        return self.ttl is not None and time.time() - self.fetched_at > self.ttl
+
+    def clear_if_expired(self):
+        if self.items and self.is_expired():
+            self.replace({})
+
+    def get(self, key) -> Optional[dict]:
+        return self.items.get(str(key))
+
+    def values(self) -> list[dict]:
+        return list(self.items.values())
+
+    def replace(self, items: dict):
+        with self._lock:
+            self.items = {str(key): value for key, value in items.items()}
+            self.fetched_at = time.time()
+            self._write()
+            self._is_dirty = False
+
+    def update(self, items: dict):
+        with self._lock:
+            self.items = {**self.items, **{str(key): value for key, value in items.items()}}
+            if not self.fetched_at:
+                self.fetched_at = time.time()
+            self._is_dirty = True
+
+    def flush(self):
+        with self._lock:
+            if self._is_dirty:
+                self._write()
+                self._is_dirty = False
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data['fetched_at'], data['items']
+        except (OSError, ValueError, KeyError, TypeError):
+            return 0.0, {}
+
+    def _write(self):
+        try:
+            os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'fetched_at': self.fetched_at, 'items': self.items}, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            self.logging.error(msg=f"[Cache] Cannot write {self.path}: {e}")
@@ -0,0 +1,74 @@
+import json
+import os
+import re
+from typing import Optional, Union
+
+from requests.cookies import RequestsCookieJar
+
+from src.ReferenceCache import CACHE_DIRECTORY
+from src.utils import set_up_logger
+
+try:
+    import win32crypt
+except ImportError:
+    win32crypt = None
+
+
+class SessionStore:
+    """
+    Authenticated cookies of one upstream, encrypted with the Windows user's DPAPI key and kept under
+    ``cache/``. Without pywin32 nothing is written, so cookies never reach the disk in clear text.
+    A cookie jar is stored with the domain and path of every cookie and loaded back as a jar.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.path = os.path.join(CACHE_DIRECTORY, f"session_{re.sub(r'[^A-Za-z0-9_.-]', '_', name)}.bin")
+        self.logging = set_up_logger("Middleware_Tool")
+
+    @staticmethod
+    def is_supported() -> bool:
+        return win32crypt is not None
+
+    def load(self) -> Optional[Union[dict, RequestsCookieJar]]:
+        if not self.is_supported():
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                _, data = win32crypt.CryptUnprotectData(f.read(), None, None, None, 0)
+            cookies = json.loads(data.decode('utf-8'))
+            if isinstance(cookies, list):
+                jar = RequestsCookieJar()
+                for cookie in cookies:
+                    jar.set(cookie['name'], cookie['value'], domain=cookie['domain'], path=cookie['path'])
+                return jar
+            return cookies
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logging.error(msg=f"[Session] Cannot read stored session {self.name}: {e}")
+            self.clear()
+            return None
+
+    def save(self, cookies: Union[dict, RequestsCookieJar]):
+        if not self.is_supported():
+            self.logging.info(msg=f"[Session] pywin32 is not available, session {self.name} is not stored")
+            return
+        if isinstance(cookies, RequestsCookieJar):
+            cookies = [{'name': cookie.name, 'value': cookie.value, 'domain': cookie.domain, 'path': cookie.path}
+                       for cookie in cookies]
+        try:
+            data = win32crypt.CryptProtectData(json.dumps(cookies).encode('utf-8'), self.name, None, None, None, 0)
+            os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            self.logging.error(msg=f"[Session] Cannot store session {self.name}: {e}")
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -1,6 +1,11 @@
+import threading
+
 import chromedriver_autoinstaller
 from selenium import webdriver
 
+_chromedriver_lock = threading.Lock()
+_chromedriver_installed = False
+
 
 class AppConfig:
     _instance = None
@@ -8,11 +13,21 @@ class AppConfig:
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(AppConfig, cls).__new__(cls)
-            chromedriver_autoinstaller.install()
             """Set driver """
-            cls._instance.chrome_driver = webdriver.Chrome()
+            cls._instance.chrome_driver = cls.create_chrome_driver()
         return cls._instance
 
+    @staticmethod
+    def create_chrome_driver():
+        # Separate Chrome for callers that need several browsers (the caller quits it)
+        global _chromedriver_installed
+        # Concurrent workers would download and unpack chromedriver to the same path at once
+        with _chromedriver_lock:
+            if not _chromedriver_installed:
+                chromedriver_autoinstaller.install()
+                _chromedriver_installed = True
+        return webdriver.Chrome()
+
     def get_chrome_driver(self):
         return self.chrome_driver
 
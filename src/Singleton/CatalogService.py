@@ -0,0 +1,69 @@
+import os
+import threading
+
+from src.Catalog import Catalog
+from src.utils import set_up_logger, ITEM_INFORMATION_FILE
+
+
+class CatalogService:
+    """
+    Process-wide owner of the product catalog.
+
+    A daemon thread polls ITEM_INFORMATION.xlsx and swaps a freshly loaded Catalog in when the file
+    changes. Readers take ``CatalogService().catalog`` once per search and keep that version, so a
+    reload never blocks or changes a search that is already running.
+    """
+    _instance = None
+    _lock = threading.Lock()
+    poll_interval = 5
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                instance = super(CatalogService, cls).__new__(cls)
+                instance.logging = set_up_logger("Middleware_Tool")
+                instance.path = ITEM_INFORMATION_FILE
+                instance._signature = instance._get_signature()
+                instance._catalog = Catalog.load(instance.path)
+                instance._stop = threading.Event()
+                instance._watcher = threading.Thread(target=instance._watch, name="CatalogWatcher", daemon=True)
+                instance._watcher.start()
+                cls._instance = instance
+        return cls._instance
+
+    @property
+    def catalog(self) -> Catalog:
+        return self._catalog
+
+    def reload_if_changed(self) -> bool:
+        signature = self._get_signature()
+        if signature is None or signature == self._signature:
+            return False
+        try:
+            catalog = Catalog.load(self.path)
+        except Exception as e:
+            # Usually the workbook is still being saved, keep serving the current version
+            self.logging.error(msg=f"[Catalog] Cannot reload {self.path}: {e}")
+            return False
+        self._catalog = catalog
+        self._signature = signature
+        self.logging.info(msg=f"[Catalog] Reloaded {self.path}")
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.reload_if_changed()
+
+    def _get_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @classmethod
+    def destroy_instance(cls):
+        with cls._lock:
+            if cls._instance:
+                cls._instance._stop.set()
+                cls._instance = None
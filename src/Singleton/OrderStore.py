@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from src.ReferenceCache import CACHE_DIRECTORY
+from src.utils import set_up_logger
+
+ORDER_STORE_FILE = os.path.join(CACHE_DIRECTORY, 'orders.sqlite3')
+SCHEMA_VERSION = 2
+
+
+class OrderStore:
+    """
+    Process-wide SQLite store of the orders already fetched and of the incremental syncs, shared across runs.
+
+    Every version of an order is keyed by (channel, id, version), where the version is ``modified_on``
+    or, for upstreams without it, a hash of the raw JSON. A row keeps the raw upstream JSON and, once
+    enriched, the enriched ``Order`` JSON with the hash of every reference it was enriched against, so a
+    change of the catalog, payment methods, order sources or combo components enriches it again instead
+    of serving stale values. A sync (one shop and order status) keeps its watermark in ``sync_state`` and
+    the orders of its window in ``sync_orders``, pointing at their version in ``orders``.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                instance = super(OrderStore, cls).__new__(cls)
+                instance.logging = set_up_logger("Middleware_Tool")
+                instance._db_lock = threading.Lock()
+                os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+                instance.connection = sqlite3.connect(ORDER_STORE_FILE, check_same_thread=False)
+                instance.connection.row_factory = sqlite3.Row
+                instance._create_tables()
+                cls._instance = instance
+        return cls._instance
+
+    def _create_tables(self):
+        with self._db_lock, self.connection:
+            if self.connection.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                # The store is a cache: an older layout is dropped and filled again by the next searches
+                self.connection.execute("DROP TABLE IF EXISTS orders")
+                self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS orders (
+                    channel TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    code TEXT,
+                    created_on TEXT,
+                    raw_json TEXT NOT NULL,
+                    enriched_json TEXT,
+                    enrichment_hash TEXT,
+                    stored_at REAL NOT NULL,
+                    PRIMARY KEY (channel, id, version)
+                )""")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS ix_orders_code ON orders (channel, code)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS ix_orders_created_on ON orders (channel, created_on)")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    name TEXT PRIMARY KEY,
+                    watermark TEXT,
+                    covered_from TEXT,
+                    covered_to TEXT,
+                    filter_key TEXT,
+                    synced_until TEXT,
+                    synced_at REAL
+                )""")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS sync_orders (
+                    name TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    channel TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    created_key TEXT NOT NULL,
+                    PRIMARY KEY (name, id)
+                )""")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS ix_sync_orders_created ON sync_orders (name, created_key)")
+
+    @staticmethod
+    def get_version(order_json: dict) -> str:
+        if order_json.get('modified_on'):
+            return str(order_json['modified_on'])
+        return hashlib.sha1(json.dumps(order_json, sort_keys=True).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def get_hash(references) -> str:
+        return hashlib.sha1(json.dumps(references, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def get_enriched(self, channel: str, order_json: dict, enrichment_hash: Optional[str]) -> Optional[str]:
+        with self._db_lock:
+            row = self.connection.execute(
+                "SELECT enriched_json, enrichment_hash FROM orders WHERE channel = ? AND id = ? AND version = ?",
+                (channel, str(order_json['id']), self.get_version(order_json))).fetchone()
+        if enrichment_hash is None or row is None or row['enrichment_hash'] != enrichment_hash:
+            return None
+        return row['enriched_json']
+
+    def find_by_code(self, channel: str, code: str, max_age: float) -> Optional[dict]:
+        # Latest raw version of the order, if it was downloaded less than max_age seconds ago
+        with self._db_lock:
+            row = self.connection.execute(
+                "SELECT raw_json FROM orders WHERE channel = ? AND code = ? AND stored_at >= ? "
+                "ORDER BY stored_at DESC LIMIT 1",
+                (channel, code, time.time() - max_age)).fetchone()
+        return json.loads(row['raw_json']) if row is not None else None
+
+    def save(self, channel: str, rows: list[tuple[dict, Optional[str], Optional[str]]]):
+        # rows: (raw order JSON, enriched Order JSON or None, enrichment hash)
+        stored_at = time.time()
+        values = [(channel, str(order_json['id']), self.get_version(order_json), order_json.get('code'),
+                   order_json.get('created_on'), json.dumps(order_json, ensure_ascii=False), enriched_json,
+                   enrichment_hash, stored_at)
+                  for order_json, enriched_json, enrichment_hash in rows]
+        try:
+            with self._db_lock, self.connection:
+                self.connection.executemany("INSERT OR REPLACE INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                            values)
+        except sqlite3.Error as e:
+            self.logging.error(msg=f"[Order Store] Cannot save {len(values)} orders of {channel}: {e}")
+
+    def get_sync_state(self, name: str) -> Optional[dict]:
+        with self._db_lock:
+            row = self.connection.execute(
+                "SELECT watermark, covered_from, covered_to, filter_key, synced_until, synced_at "
+                "FROM sync_state WHERE name = ?", (name,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def get_sync_orders(self, name: str, from_key: str, to_key: str) -> list[dict]:
+        # Raw orders of the sync created between from_key and to_key, latest first
+        with self._db_lock:
+            rows = self.connection.execute(
+                "SELECT orders.raw_json FROM sync_orders JOIN orders ON orders.channel = sync_orders.channel "
+                "AND orders.id = sync_orders.id AND orders.version = sync_orders.version "
+                "WHERE sync_orders.name = ? AND sync_orders.created_key BETWEEN ? AND ? "
+                "ORDER BY sync_orders.created_key DESC",
+                (name, from_key, to_key)).fetchall()
+        return [json.loads(row['raw_json']) for row in rows]
+
+    def save_sync(self, name: str, channel: str, state: dict, kept_orders: list[tuple[str, dict]],
+                  removed_ids: set[str], is_reset: bool):
+        # kept_orders: (created key, raw order JSON) of the orders added to or changed in the sync window
+        stored_at = time.time()
+        raw_values = [(channel, str(order_json['id']), self.get_version(order_json), order_json.get('code'),
+                       order_json.get('created_on'), json.dumps(order_json, ensure_ascii=False), stored_at)
+                      for _, order_json in kept_orders]
+        sync_values = [(name, str(order_json['id']), channel, self.get_version(order_json), created_key)
+                       for created_key, order_json in kept_orders]
+        try:
+            with self._db_lock, self.connection:
+                if is_reset:
+                    self.connection.execute("DELETE FROM sync_orders WHERE name = ?", (name,))
+                self.connection.executemany("DELETE FROM sync_orders WHERE name = ? AND id = ?",
+                                            [(name, order_id) for order_id in removed_ids])
+                # An enriched row of the same version is kept as it is
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO orders (channel, id, version, code, created_on, raw_json, stored_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", raw_values)
+                self.connection.executemany("INSERT OR REPLACE INTO sync_orders VALUES (?, ?, ?, ?, ?)", sync_values)
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (name, state['watermark'], state['covered_from'], state['covered_to'], state['filter_key'],
+                     state['synced_until'], state['synced_at']))
+        except sqlite3.Error as e:
+            self.logging.error(msg=f"[Order Store] Cannot save the sync {name}: {e}")
+
+    @classmethod
+    def destroy_instance(cls):
+        with cls._lock:
+            if cls._instance:
+                cls._instance.connection.close()
+                cls._instance = None
@@ -0,0 +1,144 @@
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Callable, Optional, TypeVar
+
+from selenium.common import TimeoutException, NoSuchElementException, StaleElementReferenceException, \
+    WebDriverException
+from selenium.webdriver.common.by import By
+
+T = TypeVar('T')
+
+# Counts the XHR / fetch calls in flight from the first call on a page, and the resources loaded since the last call
+_NETWORK_STATE_SCRIPT = """
+if (window.__middlewarePending === undefined) {
+    window.__middlewarePending = 0;
+    var send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        window.__middlewarePending++;
+        this.addEventListener('loadend', function () { window.__middlewarePending--; });
+        return send.apply(this, arguments);
+    };
+    if (window.fetch) {
+        var fetch = window.fetch;
+        window.fetch = function () {
+            window.__middlewarePending++;
+            return fetch.apply(this, arguments).finally(function () { window.__middlewarePending--; });
+        };
+    }
+}
+var loaded = performance.getEntriesByType('resource').length;
+performance.clearResourceTimings();
+return [document.readyState, window.__middlewarePending, loaded];
+"""
+
+
+class WaitEngine:
+    """
+    Process-wide polling waits for Selenium post-conditions, instead of fixed sleeps.
+
+    Every wait polls its condition every ``poll_interval`` seconds and records how long it took under a
+    locator key (row numbers are folded, so ``tr[3]`` and ``tr[4]`` share statistics). Once a key has
+    ``min_samples`` observations its timeout follows the observed latency: ``timeout_factor`` times the
+    95th percentile, kept between ``min_timeout`` and ``max_timeout``. A wait that runs out of its adapted
+    timeout is given one more chance up to ``max_timeout`` before it fails, so a slow MISA moment only
+    costs time and raises the statistics.
+    """
+    _instance = None
+    _lock = threading.Lock()
+    poll_interval = 0.1
+    quiet_period = 0.3
+    min_samples = 5
+    timeout_factor = 3
+    min_timeout = 2
+    max_timeout = 60
+    history = 50
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                instance = super(WaitEngine, cls).__new__(cls)
+                instance._stats_lock = threading.Lock()
+                instance._latencies = defaultdict(lambda: deque(maxlen=cls.history))
+                cls._instance = instance
+        return cls._instance
+
+    @staticmethod
+    def get_key(locator: str) -> str:
+        return re.sub(r'\[\d+]', '[n]', locator)
+
+    def record(self, key: str, seconds: float):
+        with self._stats_lock:
+            self._latencies[self.get_key(key)].append(seconds)
+
+    def get_timeout(self, key: str, default: float) -> float:
+        with self._stats_lock:
+            latencies = sorted(self._latencies.get(self.get_key(key), ()))
+        if len(latencies) < self.min_samples:
+            return default
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return min(self.max_timeout, max(self.min_timeout, p95 * self.timeout_factor))
+
+    def get_stats(self) -> dict:
+        # key -> (samples, median, slowest) in seconds
+        with self._stats_lock:
+            latencies = {key: sorted(values) for key, values in self._latencies.items() if values}
+        return {key: (len(values), values[len(values) // 2], values[-1]) for key, values in latencies.items()}
+
+    def until(self, condition: Callable[[], T], key: str, timeout: Optional[float] = None,
+              default_timeout: float = 10, extend: bool = True) -> T:
+        timeout = timeout if timeout is not None else self.get_timeout(key, default_timeout)
+        start = time.perf_counter()
+        deadline = start + timeout
+        extended = not extend or timeout >= self.max_timeout
+        while True:
+            try:
+                result = condition()
+            except (NoSuchElementException, StaleElementReferenceException):
+                result = None
+            if result:
+                self.record(key, time.perf_counter() - start)
+                return result
+            if time.perf_counter() >= deadline:
+                if extended:
+                    self.record(key, time.perf_counter() - start)
+                    raise TimeoutException(msg=f"Waited {time.perf_counter() - start:.1f}s for {key}")
+                deadline = start + self.max_timeout
+                extended = True
+            time.sleep(self.poll_interval)
+
+    def wait_for_count(self, driver, xpath: str, count: int, timeout: Optional[float] = None) -> bool:
+        # At least ``count`` elements match, e.g. the grid has one more row after "Thêm dòng"
+        return self.until(lambda: len(driver.find_elements(By.XPATH, xpath)) >= count, xpath, timeout)
+
+    def settle(self, driver, key: str = 'settle', max_wait: float = 2) -> bool:
+        # Best effort: returns as soon as the page is idle, or after max_wait at the latest without failing
+        try:
+            return self.wait_for_idle(driver, key, timeout=min(self.get_timeout(key, max_wait), max_wait),
+                                      extend=False)
+        except TimeoutException:
+            return False
+
+    def wait_for_idle(self, driver, key: str = 'network idle', timeout: Optional[float] = None,
+                      quiet_period: Optional[float] = None, extend: bool = True) -> bool:
+        # Page loaded, no XHR / fetch in flight and no resource loaded during the quiet period
+        quiet_period = quiet_period if quiet_period is not None else self.quiet_period
+        quiet_since = [None]
+
+        def is_idle():
+            try:
+                ready_state, pending, loaded = driver.execute_script(_NETWORK_STATE_SCRIPT)
+            except WebDriverException:
+                # Page navigating: not idle yet
+                quiet_since[0] = None
+                return False
+            now = time.perf_counter()
+            if ready_state != 'complete' or pending or loaded:
+                quiet_since[0] = None
+                return False
+            if quiet_since[0] is None:
+                quiet_since[0] = now
+            return now - quiet_since[0] >= quiet_period
+
+        return self.until(is_idle, key, timeout, extend=extend)
@@ -0,0 +1,134 @@
+import re
+from typing import List
+
+import numpy
+import pandas
+
+from src.Catalog import Catalog
+from src.Model.Order import Order
+from src.utils import set_up_logger
+
+
+class WebPricingEngine:
+    """
+    Prices the composite items of web orders in one columnar pass.
+
+    Every composite item of every order becomes a row, the catalog is joined once per distinct SKU
+    and quantity, discount, base price and VAT are computed with NumPy before the values are written
+    back to the Order objects. An order with an unknown SKU or a malformed number is logged and left
+    without composite pricing, the same outcome as the former per-order loop.
+    """
+    VAT_RATE = 0.1
+
+    def __init__(self, catalog: Catalog):
+        self.catalog = catalog
+        self.logging = set_up_logger("Middleware_Tool")
+
+    def price_orders(self, orders: List[Order]) -> set[int]:
+        # Returns the indexes of the orders that could not be priced
+        lines = []
+        composites = []
+        columns = {'order': [], 'line': [], 'line_sku': [], 'sku': [], 'line_quantity': [],
+                   'original_quantity': [], 'sale_price': []}
+
+        for order_index, order in enumerate(orders):
+            for order_line in order.order_line_items:
+                order_line.price = self.remove_letters_and_spaces(order_line.price)
+                order_line.discount_amount = 0
+                order_line.distributed_discount_amount = 0
+
+                # Check SKU of line_item not equal at first one of composite
+                order_line.is_composite = True
+                lines.append((order_index, order_line))
+                for composite_item in order_line.composite_item_domains or []:
+                    composites.append(composite_item)
+                    columns['order'].append(order_index)
+                    columns['line'].append(len(lines) - 1)
+                    columns['line_sku'].append(order_line.sku)
+                    columns['sku'].append(composite_item.sku)
+                    columns['line_quantity'].append(order_line.quantity)
+                    columns['original_quantity'].append(composite_item.original_quantity)
+                    columns['sale_price'].append(composite_item.price)
+
+        if not lines:
+            return set()
+
+        errors = {}
+        frame = pandas.DataFrame(columns)
+        line_quantity = pandas.to_numeric(frame['line_quantity'], errors='coerce').to_numpy(dtype=float)
+        original_quantity = pandas.to_numeric(frame['original_quantity'], errors='coerce').to_numpy(dtype=float)
+        sale_price = pandas.to_numeric(frame['sale_price'], errors='coerce').to_numpy(dtype=float)
+
+        # Join the catalog once per distinct SKU
+        products = {sku: self.catalog.find_product(sku) for sku in frame['sku'].unique()}
+        for sku, product in products.items():
+            if product is None:
+                for order_index in frame.loc[frame['sku'] == sku, 'order'].unique().tolist():
+                    errors.setdefault(order_index, f"Cannot found sku {sku} from resource. Please check again.")
+        sku_column = frame['sku']
+        base_price = sku_column.map(
+            {sku: float(p.Price_not_VAT) for sku, p in products.items() if p is not None}).to_numpy(dtype=float)
+        units = sku_column.map({sku: p.Unit for sku, p in products.items() if p is not None}).tolist()
+        titles = sku_column.map({sku: p.Product_Title for sku, p in products.items() if p is not None}).tolist()
+
+        # Update base price from excel file
+        quantity = numpy.trunc(numpy.where(frame['line_sku'].to_numpy() == sku_column.to_numpy(),
+                                           line_quantity, original_quantity * line_quantity))
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            discount = numpy.round(self.calculate_discount_rate(base_price, sale_price), 2)
+
+            # Formula calculate VAT After Applying Discount into Product
+            # VATTax =  (BasePrice - (BasePrice * Discount /100))  * Quantity * 10%
+            tax_amount = (base_price - base_price * discount / 100) * quantity * self.VAT_RATE
+
+        invalid_rows = ~numpy.isfinite(quantity) | ~numpy.isfinite(discount)
+        for order_index in frame.loc[invalid_rows, 'order'].unique().tolist():
+            errors.setdefault(order_index, "invalid quantity or price")
+
+        line_index = numpy.asarray(columns['line'], dtype=numpy.int64)
+        line_tax = numpy.bincount(line_index, weights=numpy.nan_to_num(tax_amount), minlength=len(lines))
+        line_base = numpy.bincount(line_index, weights=numpy.nan_to_num(base_price * quantity), minlength=len(lines))
+        line_price = pandas.to_numeric(pandas.Series([line.price for _, line in lines]),
+                                       errors='coerce').to_numpy(dtype=float)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            line_discount = numpy.round(self.calculate_discount_rate(line_base, line_price), 2)
+        for index in numpy.flatnonzero(~numpy.isfinite(line_discount)):
+            errors.setdefault(lines[index][0], "cannot calculate discount rate of line item")
+
+        # Write back the computed values
+        quantity_values = quantity.tolist()
+        discount_values = discount.tolist()
+        base_values = base_price.tolist()
+        for row, composite_item in enumerate(composites):
+            if columns['order'][row] in errors:
+                continue
+            composite_item.quantity = int(quantity_values[row])
+            composite_item.unit = units[row]
+            composite_item.discount = str(discount_values[row])
+            composite_item.price = base_values[row]
+            composite_item.sku = titles[row]
+
+        line_tax_values = line_tax.tolist()
+        line_discount_values = line_discount.tolist()
+        for index, (order_index, order_line) in enumerate(lines):
+            if order_index in errors:
+                continue
+            order_line.tax_amount = line_tax_values[index]
+            order_line.discount_rate = str(line_discount_values[index])
+
+        for order_index, error in errors.items():
+            order = orders[order_index]
+            self.logging.error(msg=f"Cannot update order information of order {order.code} with detail {order} "
+                                   f"at error {error}")
+        return set(errors)
+
+    @staticmethod
+    def remove_letters_and_spaces(input_string):
+        # Sử dụng biểu thức chính quy để loại bỏ các ký tự chữ cái và khoảng trắng
+        result = re.sub(r'[a-zA-Zđ\s,]', '', input_string)
+        return result
+
+    @staticmethod
+    def calculate_discount_rate(base_price, sale_price):
+        sale_price_before_vat = sale_price / 1.1
+        return (base_price - sale_price_before_vat) / base_price * 100
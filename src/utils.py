@@ -1,4 +1,3 @@
-import json
 import logging
 import os
 import time
@@ -6,6 +5,7 @@ from datetime import datetime, timedelta
 from functools import lru_cache
 import logging.handlers
 
+import numpy
 import pandas
 import pytz
 import yaml
@@ -14,8 +14,9 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.wait import WebDriverWait
 
-from src.InputProduct import InputProduct
+from src.InputProduct import InputProduct, InputDetailProduct
 from src.Singleton.AppConfig import AppConfig
+from src.Singleton.WaitEngine import WaitEngine
 
 
 def set_up_logger(logger_id):
@@ -64,6 +65,16 @@ def get_value_of_config(config: str) -> str:
             raise KeyError(f'Config is missing {config}')
 
 
+def get_value_of_config_or_default(config: str, default=None):
+    """
+    Same as get_value_of_config but returns ``default`` for optional settings that are not configured.
+    """
+    try:
+        return get_value_of_config(config)
+    except KeyError:
+        return default
+
+
 def get_user_env(name) -> str:
     """
     :returns environment variable value. None if does not exist.
@@ -74,51 +85,57 @@ def get_user_env(name) -> str:
     return val
 
 
-def attempt_check_exist_by_xpath(xpath, max_attempt=5):
+def attempt_check_exist_by_xpath(xpath, max_attempt=5, driver=None):
     attempt = 0
+    wait_engine = WaitEngine()
+    start = time.perf_counter()
     while attempt < max_attempt:
-        if not check_element_exist(xpath):
+        if not check_element_exist(xpath, driver=driver, timeout=wait_engine.get_timeout(xpath, 10)):
             attempt = attempt + 1
         else:
-            time.sleep(2)
+            wait_engine.record(xpath, time.perf_counter() - start)
+            wait_engine.settle(driver or AppConfig().chrome_driver)
             return
     raise NoSuchElementException(msg=f"Cannot find element at XPath {xpath}")
 
 
-def attempt_check_can_clickable_by_xpath(xpath, max_attempt=5):
+def attempt_check_can_clickable_by_xpath(xpath, max_attempt=5, driver=None):
     attempt = 0
+    wait_engine = WaitEngine()
+    start = time.perf_counter()
     while attempt < max_attempt:
-        if not check_element_can_clickable(xpath):
+        if not check_element_can_clickable(xpath, driver=driver, timeout=wait_engine.get_timeout(xpath, 10)):
             attempt = attempt + 1
         else:
-            time.sleep(2)
+            wait_engine.record(xpath, time.perf_counter() - start)
+            wait_engine.settle(driver or AppConfig().chrome_driver)
             return
     raise NoSuchElementException(msg=f"Cannot clickable element at XPath {xpath}")
 
 
-# Wait for the presence of a specific element on the page
-def check_element_exist(element, type: By = By.XPATH, timeout=10):
+# Wait for the presence of a specific element on the page, driver defaults to the AppConfig one
+def check_element_exist(element, type: By = By.XPATH, timeout=10, driver=None):
     try:
         element_present = EC.presence_of_element_located((type, element))
-        WebDriverWait(AppConfig().chrome_driver, timeout).until(element_present)
+        WebDriverWait(driver or AppConfig().chrome_driver, timeout).until(element_present)
         return True
     except TimeoutException:
         return False
 
 
-def check_element_not_exist(element: object, type: By = By.XPATH, timeout: object = 10) -> object:
+def check_element_not_exist(element: object, type: By = By.XPATH, timeout: object = 10, driver=None) -> object:
     try:
         element_present = EC.invisibility_of_element((type, element))
-        WebDriverWait(AppConfig().chrome_driver, timeout).until(element_present)
+        WebDriverWait(driver or AppConfig().chrome_driver, timeout).until(element_present)
         return True
     except TimeoutException:
         return False
 
 
-def check_element_can_clickable(element, type: By = By.XPATH, timeout=10):
+def check_element_can_clickable(element, type: By = By.XPATH, timeout=10, driver=None):
     try:
         element_present = EC.element_to_be_clickable((type, element))
-        WebDriverWait(AppConfig().chrome_driver, timeout).until(element_present)
+        WebDriverWait(driver or AppConfig().chrome_driver, timeout).until(element_present)
         return True
     except TimeoutException:
         return False
@@ -140,50 +157,54 @@ def get_money_format(money):
         return money
 
 
-def get_item_information() -> list[InputProduct]:
-    excel_data_df = pandas.read_excel('ITEM_INFORMATION.xlsx', sheet_name='Sheet1', skiprows=1)
+ITEM_INFORMATION_FILE = 'ITEM_INFORMATION.xlsx'
 
-    # Group columns
-    grouped = excel_data_df.groupby(['ITEM_ID', 'ITEM_NAME', 'ITEM_QUANTITY']).agg(list)
-    convert_to_json = grouped.to_json(orient='index', indent=4)
 
-    data = json.loads(convert_to_json)
+def get_item_information(path: str = ITEM_INFORMATION_FILE) -> list[InputProduct]:
+    logger = set_up_logger("Middleware_Tool")
+    start = time.perf_counter()
+    excel_data_df = pandas.read_excel(path, sheet_name='Sheet1', skiprows=1)
 
-    # Initialize an empty list for the transformed items
-    transformed_data = []
+    # Group columns, group ids follow the sorted key order; rows with an empty key are dropped
+    group_ids = excel_data_df.groupby(['ITEM_ID', 'ITEM_NAME', 'ITEM_QUANTITY'], sort=True).ngroup()
+    group_ids = group_ids.fillna(-1).astype('int64').to_numpy()
+    positions = numpy.argsort(group_ids, kind='stable')
+    positions = positions[group_ids[positions] >= 0]
+    groups = numpy.split(positions, numpy.flatnonzero(numpy.diff(group_ids[positions])) + 1)
+
+    # Column arrays as native Python values, empty cells become None
+    columns = {name: _get_column_values(excel_data_df[name])
+               for name in ['ITEM_ID', 'ITEM_NAME', 'ITEM_QUANTITY', 'PRODUCT_ID', 'PRODUCT_TITLE',
+                            'PRODUCT_NAME', 'PRODUCT_QUANTITY', 'UNIT', 'PRICE_NOT_VAT']}
+    # An integer price column still gives float prices, as the Price_not_VAT field is typed
+    columns['PRICE_NOT_VAT'] = [float(price) if price is not None else None for price in columns['PRICE_NOT_VAT']]
 
-    # Process each item in the original data
-    for key, value in data.items():
-        # Split the key into its components and strip unnecessary characters
-        item_id, item_name, item_quantity = eval(key)
-
-        # Extract products data
-        products = []
-        for i in range(len(value["PRODUCT_ID"])):
-            product = {
-                "Product_Id": value["PRODUCT_ID"][i],
-                "Product_Title": value["PRODUCT_TITLE"][i],
-                "Product_Name": value["PRODUCT_NAME"][i],
-                "Product_Quantity": value["PRODUCT_QUANTITY"][i],
-                "Unit": value["UNIT"][i].strip(),
-                "Price_not_VAT": value["PRICE_NOT_VAT"][i]
-            }
-            products.append(product)
-
-        # Create a new dictionary for the transformed item
-        transformed_item = {
-            "Item_Id": item_id,
-            "Item_Name": item_name,
-            "Item_Quantity": item_quantity,
-            "Product": products
-        }
-
-        # Append the transformed item to the list
-        transformed_data.append(InputProduct.from_dict(transformed_item))
-    # Convert the list of transformed items back to a JSON string
+    transformed_data = []
+    for rows in groups:
+        if len(rows) == 0:
+            continue
+        first = rows[0]
+        products = [InputDetailProduct(Product_Id=columns['PRODUCT_ID'][i],
+                                       Product_Title=columns['PRODUCT_TITLE'][i],
+                                       Product_Name=columns['PRODUCT_NAME'][i],
+                                       Product_Quantity=columns['PRODUCT_QUANTITY'][i],
+                                       Unit=columns['UNIT'][i].strip(),
+                                       Price_not_VAT=columns['PRICE_NOT_VAT'][i])
+                    for i in rows.tolist()]
+        transformed_data.append(InputProduct(Item_Id=columns['ITEM_ID'][first],
+                                             Item_Name=columns['ITEM_NAME'][first],
+                                             Item_Quantity=columns['ITEM_QUANTITY'][first],
+                                             Product=products))
+
+    logger.info(msg=f"[Catalog] Parsed {path}: {len(excel_data_df)} rows, {len(transformed_data)} items, "
+                    f"{len(positions)} products in {time.perf_counter() - start:.3f}s")
     return transformed_data
 
 
+def _get_column_values(column: pandas.Series) -> list:
+    return column.astype(object).where(column.notna(), None).tolist()
+
+
 def parse_time_to_vietnam_zone(date: str):
     utc_time_format = datetime.strptime(date, '%Y-%m-%dT%H:%M:%SZ')
     local_tz = pytz.timezone('Asia/Ho_Chi_Minh')
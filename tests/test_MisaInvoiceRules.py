@@ -0,0 +1,138 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from src.Enums import Channel
+from src.MisaInvoiceRules import get_order_date, get_sale_customer_name, get_warehouse_customer_name, \
+    get_invoice_lines, is_promotion, get_marketplace_discount, has_order_discount, get_order_discount_line, \
+    get_appendix_notes, get_warehouse_quantities
+from src.Model.Item import Item, CompositeItem
+from src.Model.MisaRequestTable import MisaRequestTable
+from src.Model.Order import Order
+from src.utils import get_money_format
+
+
+def create_sapo_order(source_name='Lazada') -> Order:
+    return Order(
+        id='1', code='SON1001', created_on='2024-03-05T08:30:00Z', customer_data=None, status='finalized',
+        source_name=source_name, order_discount_amount='22000',
+        order_line_items=[
+            Item(sku='SKU-A', quantity=2, price='150000', discount_rate='10.0', discount_value='15000',
+                 discount_amount='0', distributed_discount_amount='11000'),
+            Item(sku='COMBO-1', quantity=1, price='300000', discount_rate='0', discount_value='30000',
+                 discount_amount='5000', distributed_discount_amount='11000', is_composite=True,
+                 composite_item_domains=[CompositeItem(sku='SKU-A', quantity=1, price=100000.0),
+                                         CompositeItem(sku='SKU-B', quantity=3, price=66666.67)]),
+            Item(sku='GIFT-1', quantity=1, price='0', discount_rate='100.0', discount_value=None,
+                 discount_amount='0', distributed_discount_amount='0'),
+        ])
+
+
+def create_web_order() -> Order:
+    return Order(
+        id='2', code='WEB2002', created_on='14:05:09 - 07/03/2024', customer_data=None, status='completed',
+        order_line_items=[
+            Item(sku='SKU-A', quantity=1, composite_item_domains=[CompositeItem(sku='SKU-A', quantity=1, discount=0)]),
+            Item(sku='COMBO-2', quantity=1,
+                 composite_item_domains=[CompositeItem(sku='SKU-B', quantity=2, discount=5),
+                                         CompositeItem(sku='SKU-A', quantity=1, discount=5)]),
+        ])
+
+
+@patch('src.MisaInvoiceRules.get_value_of_config', return_value='[TEST]')
+class TestSapoInvoiceRules(unittest.TestCase):
+    def setUp(self):
+        self.order = create_sapo_order()
+
+    def test_customer_names(self, _):
+        self.assertEqual(get_sale_customer_name(self.order, Channel.SAPO),
+                         '[TEST]Khách hàng lẻ không lấy hóa đơn (Bán hàng qua Lazada)')
+        self.assertEqual(get_warehouse_customer_name(self.order, Channel.SAPO),
+                         '[TEST] Mã đơn hàng: SON1001(Bán hàng qua Lazada)')
+
+    def test_order_date(self, _):
+        self.assertEqual(get_order_date(self.order, Channel.SAPO), datetime(2024, 3, 5, 8, 30))
+
+    def test_invoice_lines_split_combos_on_the_combo_values(self, _):
+        self.assertEqual(get_invoice_lines(self.order, Channel.SAPO), [
+            MisaRequestTable(sku='SKU-A', quantity=2, discount_rate='10.0', current_row=1, source_name='Lazada',
+                             price='150000', line_amount=150000.0, default_item_quantity=2,
+                             discount_value=15000.0, unit_price=150000.0),
+            MisaRequestTable(sku='SKU-A', quantity=1, discount_rate='0', current_row=2, source_name='Lazada',
+                             price='300000', line_amount=300000.0, default_item_quantity=1,
+                             discount_value=30000.0, unit_price=100000.0),
+            MisaRequestTable(sku='SKU-B', quantity=3, discount_rate='0', current_row=3, source_name='Lazada',
+                             price='300000', line_amount=300000.0, default_item_quantity=1,
+                             discount_value=30000.0, unit_price=66666.67),
+            MisaRequestTable(sku='GIFT-1', quantity=1, discount_rate='100.0', current_row=4, source_name='Lazada',
+                             price='0', line_amount=0.0, default_item_quantity=1, discount_value=0.0,
+                             unit_price=0.0),
+        ])
+
+    def test_promotion_lines(self, _):
+        self.assertEqual([is_promotion(line) for line in get_invoice_lines(self.order, Channel.SAPO)],
+                         [False, False, False, True])
+
+    def test_marketplace_discount(self, _):
+        lines = get_invoice_lines(self.order, Channel.SAPO)
+        # Discount of the combo spread on the amount MISA shows for a component
+        self.assertEqual(get_marketplace_discount(lines[1], 120000), round(120000 / 300000 * 30000))
+        self.assertEqual(get_marketplace_discount(lines[3], 0), 0)
+
+    def test_order_discount_line_without_vat(self, _):
+        self.assertTrue(has_order_discount(self.order))
+        line = get_order_discount_line(self.order)
+        self.assertEqual((line.sku, line.quantity, line.current_row), ('[TEST]', 0, 5))
+        self.assertEqual(get_money_format(line.line_amount).replace(',', '.'),
+                         get_money_format(float(self.order.order_discount_amount) / 1.1).replace(',', '.'))
+        self.assertEqual(round(line.line_amount), 20000)
+
+    def test_no_order_discount(self, _):
+        for item in self.order.order_line_items:
+            item.distributed_discount_amount = '0'
+        self.assertFalse(has_order_discount(self.order))
+        self.assertIsNone(get_order_discount_line(self.order))
+
+    def test_appendix_notes(self, _):
+        self.assertEqual(get_appendix_notes(self.order, Channel.SAPO),
+                         ['Chiết khấu cho khách hàng đặc biệt.', 'Mã đơn hàng: SON1001'])
+        self.order.order_line_items[1].discount_amount = '0'
+        self.assertEqual(get_appendix_notes(self.order, Channel.SAPO), ['Mã đơn hàng: SON1001'])
+
+    def test_warehouse_quantities(self, _):
+        self.assertEqual(get_warehouse_quantities(self.order.order_line_items, Channel.SAPO),
+                         {'SKU-A': 3, 'SKU-B': 3, 'GIFT-1': 1})
+
+
+@patch('src.MisaInvoiceRules.get_value_of_config', return_value='[TEST]')
+class TestWebInvoiceRules(unittest.TestCase):
+    def setUp(self):
+        self.order = create_web_order()
+
+    def test_customer_names(self, _):
+        self.assertEqual(get_sale_customer_name(self.order, Channel.WEB),
+                         '[TEST]Khách hàng lẻ không lấy hóa đơn (Bán hàng qua Website: giangs.vn)')
+        self.assertEqual(get_warehouse_customer_name(self.order, Channel.WEB),
+                         '[TEST] Mã đơn hàng: WEB2002(Bán hàng qua Website: giangs.vn)')
+
+    def test_order_date(self, _):
+        self.assertEqual(get_order_date(self.order, Channel.WEB), datetime(2024, 3, 7, 14, 5, 9))
+
+    def test_invoice_lines_use_the_components(self, _):
+        self.assertEqual(get_invoice_lines(self.order, Channel.WEB), [
+            MisaRequestTable(sku='SKU-A', quantity=1, discount_rate=0, current_row=1),
+            MisaRequestTable(sku='SKU-B', quantity=2, discount_rate=5, current_row=2),
+            MisaRequestTable(sku='SKU-A', quantity=1, discount_rate=5, current_row=3),
+        ])
+
+    def test_appendix_notes(self, _):
+        self.assertEqual(get_appendix_notes(self.order, Channel.WEB),
+                         ['Bổ sung đơn hàng ngày 7/3/2024 (Mã đơn hàng: WEB2002)'])
+
+    def test_warehouse_quantities(self, _):
+        self.assertEqual(get_warehouse_quantities(self.order.order_line_items, Channel.WEB),
+                         {'SKU-A': 2, 'SKU-B': 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
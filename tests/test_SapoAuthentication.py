@@ -0,0 +1,135 @@
+import base64
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs
+
+import requests
+
+from src.Authentication.FormSapoAuthentication import FormSapoAuthentication
+from src.Authentication.PrivateAppSapoAuthentication import PrivateAppSapoAuthentication
+from src.Exceptions import ValidationError
+from src.HttpTransport import HttpTransport
+
+LOGIN_PAGE = """
+<html><body>
+<form id="search-form" action="/search"><input name="q"></form>
+<form id="pos-login-form" action="/login" method="post">
+    <input type="hidden" name="csrf_token" value="token-1">
+    <input type="text" name="username">
+    <input type="password" name="password">
+</form>
+</body></html>
+"""
+API_KEY, API_SECRET = 'key-1', 'secret-1'
+
+
+class StandInSapoHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in of the Sapo login page and shop admin. The login is served on 127.0.0.1 and the shop on
+    localhost, so the single sign-on and the shop cookies belong to two domains.
+    """
+
+    def do_GET(self):
+        if self.path == '/login':
+            self._send(200, LOGIN_PAGE, 'text/html')
+        elif self.path == '/admin':
+            self._send(200, 'admin', 'text/html', cookies=['session=shop-side; Path=/'])
+        elif self.path == '/echo':
+            self._send(200, self.headers.get('Cookie', ''), 'text/plain')
+        elif self.path.startswith('/admin/orders.json'):
+            expected = 'Basic ' + base64.b64encode(f'{API_KEY}:{API_SECRET}'.encode()).decode()
+            if self.headers.get('Authorization') == expected:
+                self._send(200, json.dumps({'orders': []}), 'application/json')
+            else:
+                self._send(401, '', 'text/plain')
+        else:
+            self._send(404, '', 'text/plain')
+
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode())
+        if self.path == '/login' and form == {'csrf_token': ['token-1'], 'username': ['0900000000'],
+                                              'password': ['secret']}:
+            self._send(200, 'ok', 'text/html', cookies=['sso=sso-1; Path=/', 'session=sso-side; Path=/'])
+        else:
+            self._send(403, '', 'text/plain')
+
+    def _send(self, status, body, content_type, cookies=()):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        for cookie in cookies:
+            self.send_header('Set-Cookie', cookie)
+        data = body.encode('utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServerTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInSapoHandler)
+        cls.port = cls.server.server_address[1]
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+
+class TestFormSapoAuthentication(StandInServerTestCase):
+    def setUp(self):
+        self.config = {'sapo_url': f'http://127.0.0.1:{self.port}/login',
+                       'sapo_phone': '0900000000',
+                       'sapo_password': 'secret'}
+        self.shop_domain = f'http://localhost:{self.port}'
+
+    def login(self):
+        with patch('src.Authentication.FormSapoAuthentication.get_value_of_config', side_effect=self.config.get):
+            return FormSapoAuthentication(self.shop_domain, HttpTransport('sapo-form-test')).login()
+
+    def test_login_keeps_the_domain_of_every_cookie(self):
+        cookies = self.login()
+        sessions = {cookie.domain: cookie.value for cookie in cookies if cookie.name == 'session'}
+        self.assertEqual(len(sessions), 2)
+        self.assertIn('sso-side', sessions.values())
+        self.assertIn('shop-side', sessions.values())
+        self.assertEqual([cookie.value for cookie in cookies if cookie.name == 'sso'], ['sso-1'])
+
+    def test_loaded_cookies_are_sent_to_their_own_domain(self):
+        cookies = self.login()
+        transport = HttpTransport('sapo-shop-test', cookie_provider=lambda: cookies)
+        shop_cookies = transport.get(f'{self.shop_domain}/echo').text
+        self.assertIn('session=shop-side', shop_cookies)
+        self.assertNotIn('sso-side', shop_cookies)
+
+    def test_wrong_password_fails(self):
+        self.config['sapo_password'] = 'wrong'
+        with self.assertRaises(requests.HTTPError):
+            self.login()
+
+
+class TestPrivateAppSapoAuthentication(StandInServerTestCase):
+    def test_login_uses_the_credentials_of_the_shop(self):
+        domain = f'http://127.0.0.1:{self.port}'
+        config = {'sapo_private_apps': {f'127.0.0.1:{self.port}': {'api_key': API_KEY, 'api_secret': API_SECRET}}}
+        transport = HttpTransport('sapo-private-app-test')
+        with patch('src.Authentication.PrivateAppSapoAuthentication.get_value_of_config', side_effect=config.get):
+            self.assertEqual(PrivateAppSapoAuthentication(domain, transport).login(), {})
+        response = transport.get(f'{domain}/admin/orders.json?page=1&limit=1', authenticate=False)
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_credentials_fail(self):
+        with patch('src.Authentication.PrivateAppSapoAuthentication.get_value_of_config', return_value={}):
+            with self.assertRaises(ValidationError):
+                PrivateAppSapoAuthentication(f'http://127.0.0.1:{self.port}', HttpTransport('test')).login()
+
+
+if __name__ == '__main__':
+    unittest.main()